@@ -5,16 +5,23 @@
 """
 
 import asyncio
+import signal
 import sys
 from pathlib import Path
 import os
 
+import uvloop
+
 # Добавляем корневую директорию в path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.infrastructure.ai.elevenlabs_client import ElevenLabsClient
 from src.core.config import get_settings
 
+# Baresip читает pipe фреймами по 320 байт; пишем пачками по 5 фреймов
+PIPE_FRAME_BYTES = 320
+PIPE_BATCH_BYTES = 5 * PIPE_FRAME_BYTES
+
 
 async def main():
     print("=" * 50)
@@ -27,7 +34,9 @@ async def main():
     config = {
         'api_key': settings.elevenlabs_api_key,
         'agent_id': settings.elevenlabs_agent_id,
-        'ws_url': settings.elevenlabs_ws_url
+        'ws_url': settings.elevenlabs_ws_url,
+        'optimize_streaming_latency': settings.elevenlabs_optimize_streaming_latency,
+        'debug': settings.elevenlabs_debug
     }
     
     # Прокси конфигурация
@@ -44,22 +53,23 @@ async def main():
     
     client = ElevenLabsClient(config, proxy_config)
     
-    # Открываем файл для записи аудио
-    audio_file = open("debug_audio.pcm", "wb")
+    # Открываем файл для записи аудио (буфер 64KB, сбрасывается при закрытии)
+    audio_file = open("debug_audio.pcm", "wb", buffering=64 * 1024)
     
     # Также пробуем открыть pipe (если Baresip запущен)
     pipe_fd = None
+    pipe_path = "/tmp/baresip_audio_in.pcm"
     try:
-        pipe_path = "/tmp/baresip_audio_in.pcm"
-        if os.path.exists(pipe_path):
-            # Используем O_RDWR на macOS чтобы избежать блокировки
-            pipe_fd = os.open(pipe_path, os.O_RDWR | os.O_NONBLOCK)
-            print(f"✅ Opened pipe: {pipe_path}")
-        else:
-            print(f"⚠️  Pipe not found: {pipe_path}")
+        # Используем O_RDWR на macOS чтобы избежать блокировки
+        pipe_fd = os.open(pipe_path, os.O_RDWR | os.O_NONBLOCK)
+        print(f"✅ Opened pipe: {pipe_path}")
+    except FileNotFoundError:
+        print(f"⚠️  Pipe not found: {pipe_path}")
     except Exception as e:
         print(f"❌ Cannot open pipe: {e}")
     
+    pipe_buffer = bytearray()
+    
     try:
         # Подключаемся
         print("\n🔌 Connecting to ElevenLabs...")
@@ -74,14 +84,19 @@ async def main():
         
         chunks = 0
         total_bytes = 0
-        start_time = asyncio.get_event_loop().time()
+        loop = asyncio.get_running_loop()
+        loop_time = loop.time
+        start_time = loop_time()
+        
+        # Ctrl+C / SIGTERM завершают запись штатно, чтобы буфер файла успел сброситься
+        stop_event = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
         
-        while asyncio.get_event_loop().time() - start_time < 30:
+        while not stop_event.is_set() and loop_time() - start_time < 30:
             try:
-                audio = await asyncio.wait_for(
-                    client.receive_audio(),
-                    timeout=0.5
-                )
+                async with asyncio.timeout(0.5):
+                    audio = await client.receive_audio()
                 
                 if audio:
                     chunks += 1
@@ -89,16 +104,19 @@ async def main():
                     
                     # Сохраняем в файл
                     audio_file.write(audio)
-                    audio_file.flush()
                     
-                    # Пробуем записать в pipe
+                    # Пробуем записать в pipe: копим чанки целиком и пишем кратно 320 байт
                     if pipe_fd:
-                        try:
-                            # Для pipe нужно писать чанками по 320 байт (8kHz)
-                            # Но у нас аудио в другом формате, поэтому пишем как есть
-                            os.write(pipe_fd, audio[:320] if len(audio) >= 320 else audio)
-                        except:
-                            pass  # Игнорируем ошибки pipe
+                        pipe_buffer.extend(audio)
+                        if len(pipe_buffer) >= PIPE_BATCH_BYTES:
+                            batch_size = len(pipe_buffer) - len(pipe_buffer) % PIPE_FRAME_BYTES
+                            # Пишем срез через memoryview без копии; view освобождаем до del
+                            with memoryview(pipe_buffer) as view, view[:batch_size] as batch:
+                                try:
+                                    written = os.write(pipe_fd, batch)
+                                except BlockingIOError:
+                                    written = batch_size  # Pipe переполнен - пачку отбрасываем
+                            del pipe_buffer[:written]
                     
                     if chunks == 1:
                         print(f"🎵 First chunk! Size: {len(audio)} bytes")
@@ -125,9 +143,16 @@ async def main():
         await client.disconnect()
         audio_file.close()
         if pipe_fd:
+            # Дописываем остаток последней пачки - только целые фреймы по 320 байт
+            tail_size = len(pipe_buffer) - len(pipe_buffer) % PIPE_FRAME_BYTES
+            if tail_size:
+                try:
+                    os.write(pipe_fd, pipe_buffer[:tail_size])
+                except BlockingIOError:
+                    pass  # Pipe переполнен - остаток отбрасываем, как и пачки выше
             os.close(pipe_fd)
         print("\n✅ Done")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(), loop_factory=uvloop.new_event_loop)
\ No newline at end of file
@@ -6,8 +6,10 @@ echo "🔄 Restarting Audio Bridge with latest code..."
 echo "📝 Clearing old logs..."
 > logs/audio_bridge.log
 
-# Очищаем старые сигналы
-rm -f /tmp/connect_websocket /tmp/disconnect_websocket
+# Очищаем старые сигнальные файлы (FIFO мост пересоздаёт сам)
+for sig in /tmp/connect_websocket /tmp/disconnect_websocket; do
+    [ -p "$sig" ] || rm -f "$sig"
+done
 
 echo "✅ Ready to start with fresh logs"
 echo ""
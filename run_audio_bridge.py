@@ -7,15 +7,23 @@
 import asyncio
 import signal
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 
 # Добавляем корневую директорию в path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.infrastructure.audio.audio_bridge_websocket import AudioBridgeWebSocket
+from src.infrastructure.audio.bridge_signals import (
+    BridgeSignalPipe,
+    CONNECT_SIGNAL_PIPE,
+    DISCONNECT_SIGNAL_PIPE,
+)
 from src.core.config import get_settings, AudioConfig, ElevenLabsConfig
 import structlog
+import uvloop
 
 # Настройка логирования
 structlog.configure(
@@ -47,6 +55,14 @@ class AudioBridgeDaemon:
         self.bridge = None
         self.running = False
         self.start_time = None
+        self.stop_event = asyncio.Event()
+        
+        # Сигналы от API о подключении/отключении WebSocket
+        self.connect_evt = asyncio.Event()
+        self.disconnect_evt = asyncio.Event()
+        self._signal_pipes: list[BridgeSignalPipe] = []
+        self._signal_task: Optional[asyncio.Task] = None
+        self._status_task: Optional[asyncio.Task] = None
         
     async def start(self):
         """Запуск демона"""
@@ -84,7 +100,9 @@ class AudioBridgeDaemon:
         elevenlabs_config = ElevenLabsConfig(
             api_key=settings.elevenlabs_api_key,
             agent_id=settings.elevenlabs_agent_id,
-            ws_url=settings.elevenlabs_ws_url
+            ws_url=settings.elevenlabs_ws_url,
+            optimize_streaming_latency=settings.elevenlabs_optimize_streaming_latency,
+            debug=settings.elevenlabs_debug
         )
         
         # Конфигурация прокси
@@ -116,8 +134,14 @@ class AudioBridgeDaemon:
             print("⏸️  WebSocket NOT connected yet - waiting for call signal")
             print("   Will connect only when someone answers the phone!")
             
-            # Запускаем мониторинг файла-сигнала для подключения WebSocket
-            asyncio.create_task(self._monitor_websocket_signal())
+            # Открываем сигнальные каналы и ждём сигнала для подключения WebSocket
+            self._signal_pipes = [
+                BridgeSignalPipe(CONNECT_SIGNAL_PIPE, self.connect_evt),
+                BridgeSignalPipe(DISCONNECT_SIGNAL_PIPE, self.disconnect_evt),
+            ]
+            for pipe in self._signal_pipes:
+                pipe.open()
+            self._signal_task = asyncio.create_task(self._monitor_websocket_signal())
             
             self.running = True
             self.start_time = datetime.now()
@@ -127,7 +151,7 @@ class AudioBridgeDaemon:
             print("-"*50)
             
             # Мониторинг статуса
-            await self.monitor_status()
+            self._status_task = asyncio.create_task(self.monitor_status())
             
         except Exception as e:
             logger.error(f"Failed to start bridge: {e}")
@@ -136,64 +160,49 @@ class AudioBridgeDaemon:
     
     async def _monitor_websocket_signal(self):
         """Мониторинг сигнала для подключения/отключения WebSocket"""
-        import os
-        websocket_connected = False
-        
         print("🔍 Starting WebSocket signal monitor...")
-        print(f"   Checking for signals every 100ms")
+        print(f"   Waiting for signals on {CONNECT_SIGNAL_PIPE} / {DISCONNECT_SIGNAL_PIPE}")
         
-        check_count = 0
-        while self.running:
+        while True:
             try:
-                check_count += 1
-                if check_count % 50 == 0:  # Каждые 5 секунд
-                    print(f"   [Monitor] Still checking... (WebSocket connected: {websocket_connected})")
+                # Сигнал отключения без активного WebSocket не имеет смысла
+                self.disconnect_evt.clear()
+                await self.connect_evt.wait()
+                self.connect_evt.clear()
                 
-                # Проверяем сигнал для подключения
-                if not websocket_connected and os.path.exists("/tmp/connect_websocket"):
-                    print("\n🎯 CALL ANSWERED! Connecting to ElevenLabs WebSocket...")
-                    print(f"   Signal file found at: /tmp/connect_websocket")
-                    await self.bridge.start_websocket()
-                    print("✅ ElevenLabs WebSocket connected!")
-                    websocket_connected = True
-                    os.remove("/tmp/connect_websocket")
-                    print("   Signal file removed")
+                print("\n🎯 CALL ANSWERED! Connecting to ElevenLabs WebSocket...")
+                await self.bridge.start_websocket()
+                print("✅ ElevenLabs WebSocket connected!")
                 
-                # Проверяем сигнал для отключения
-                elif websocket_connected and os.path.exists("/tmp/disconnect_websocket"):
-                    print("\n📵 CALL ENDED! Disconnecting ElevenLabs WebSocket...")
-                    await self.bridge.elevenlabs.disconnect()
-                    print("✅ ElevenLabs WebSocket disconnected, credits saved!")
-                    websocket_connected = False
-                    os.remove("/tmp/disconnect_websocket")
-                    
-                await asyncio.sleep(0.1)  # Проверка каждые 100мс для минимальной задержки
+                await self.disconnect_evt.wait()
+                # Повторные сигналы подключения во время звонка не должны переподключать WebSocket
+                self.connect_evt.clear()
                 
+                print("\n📵 CALL ENDED! Disconnecting ElevenLabs WebSocket...")
+                await self.bridge.elevenlabs.disconnect()
+                print("✅ ElevenLabs WebSocket disconnected, credits saved!")
+                
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"WebSocket signal monitor error: {e}")
                 await asyncio.sleep(1)
     
     async def monitor_status(self):
         """Мониторинг и вывод статуса"""
-        status_counter = 0
-        
         while self.running:
             try:
-                await asyncio.sleep(5)  # Обновление каждые 5 секунд
+                await asyncio.sleep(30)  # Полный статус каждые 30 секунд
+                
+                uptime = datetime.now() - self.start_time
+                metrics = self.bridge.metrics
                 
-                status_counter += 1
+                print(f"\n📊 Status Update [{datetime.now().strftime('%H:%M:%S')}]")
+                print(f"   Uptime: {uptime}")
+                print(f"   Packets processed: {metrics.packets_from_caller + metrics.packets_from_ai}")
+                print(f"   Data transferred: {(metrics.bytes_from_caller + metrics.bytes_from_ai) / 1024:.1f} KB")
+                print(f"   Errors: {metrics.errors}")
                 
-                # Каждые 30 секунд показываем полный статус
-                if status_counter % 6 == 0:
-                    uptime = datetime.now() - self.start_time
-                    metrics = self.bridge.metrics
-                    
-                    print(f"\n📊 Status Update [{datetime.now().strftime('%H:%M:%S')}]")
-                    print(f"   Uptime: {uptime}")
-                    print(f"   Packets processed: {metrics.packets_from_caller + metrics.packets_from_ai}")
-                    print(f"   Data transferred: {(metrics.bytes_from_caller + metrics.bytes_from_ai) / 1024:.1f} KB")
-                    print(f"   Errors: {metrics.errors}")
-                    
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -204,6 +213,20 @@ class AudioBridgeDaemon:
         print("\n⏹️  Stopping audio bridge...")
         self.running = False
         
+        if self._status_task:
+            self._status_task.cancel()
+            await asyncio.gather(self._status_task, return_exceptions=True)
+            self._status_task = None
+        
+        if self._signal_task:
+            self._signal_task.cancel()
+            await asyncio.gather(self._signal_task, return_exceptions=True)
+            self._signal_task = None
+        
+        for pipe in self._signal_pipes:
+            pipe.close()
+        self._signal_pipes = []
+        
         if self.bridge:
             await self.bridge.stop()
         
@@ -215,30 +238,28 @@ class AudioBridgeDaemon:
         
         # Ждём сигнала остановки
         try:
-            while self.running:
-                await asyncio.sleep(1)
-        except KeyboardInterrupt:
-            pass
+            await self.stop_event.wait()
         finally:
             await self.stop()
-
-
-def signal_handler(sig, frame):
-    """Обработчик сигналов"""
-    print("\n📛 Received interrupt signal")
-    # Устанавливаем флаг для корректной остановки
-    if daemon.running:
-        daemon.running = False
+    
+    def request_stop(self):
+        """Обработчик сигналов остановки"""
+        print("\n📛 Received interrupt signal")
+        # Будим run() для корректной остановки
+        self.stop_event.set()
 
 
 async def main():
     """Главная функция"""
-    global daemon
     daemon = AudioBridgeDaemon()
     
-    # Устанавливаем обработчик сигналов
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    # Устанавливаем обработчик сигналов в цикле событий
+    loop = asyncio.get_running_loop()
+    # Ресэмплинг и декодирование идут в собственных пулах моста; стандартному
+    # пулу остаются только DNS-резолв и редкие блокирующие вызовы
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=2, thread_name_prefix="bridge"))
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, daemon.request_stop)
     
     try:
         await daemon.run()
@@ -249,7 +270,7 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(), loop_factory=uvloop.new_event_loop)
     except KeyboardInterrupt:
         print("\n👋 Goodbye!")
     except Exception as e:
@@ -3,24 +3,32 @@ from typing import Optional
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
+import orjson
 import structlog
 
 from src.api.routers import calls
 from src.core.config import get_settings
 from src.core.di import setup_di
+from src.services.call_monitor import CallMonitor
 # SIPCallMonitor отключён - события мониторятся напрямую через Baresip TCP
 
 
 logger = structlog.get_logger()
 
+# Ответ /health не меняется - сериализуем один раз
+HEALTH_RESPONSE_BODY = orjson.dumps({
+    "status": "healthy",
+    "service": "voice-ai-agent"
+})
+
 # SIPCallMonitor больше не используется
 # События от Baresip обрабатываются напрямую в CallService._monitor_call_events()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await logger.ainfo("Starting Voice AI Agent API")
+    logger.info("Starting Voice AI Agent API")
     
     # ВАЖНО: HTTP polling через SIPCallMonitor отключён!
     # События SIP мониторятся напрямую через Baresip TCP в CallService._monitor_call_events()
@@ -28,12 +36,17 @@ async def lifespan(app: FastAPI):
     # - Избыточные HTTP запросы каждые 2 секунды
     # - Циклическую зависимость (API опрашивал сам себя)
     # - Задержки в обработке событий
-    await logger.ainfo("✅ API started - SIP events monitored directly via Baresip TCP")
-    await logger.ainfo("📡 Call events flow: Baresip TCP → CallService → WebSocket signals → AudioBridge")
+    # Лимиты дозвона/разговора и завершение по SIP событиям - подписчик событий CallService
+    call_monitor = await app.state.dishka_container.get(CallMonitor)
+    await call_monitor.start()
+    
+    logger.info("✅ API started - SIP events monitored directly via Baresip TCP")
+    logger.info("📡 Call events flow: Baresip TCP → CallService → WebSocket signals → AudioBridge")
     
     yield
     
-    await logger.ainfo("Shutting down Voice AI Agent API")
+    logger.info("Shutting down Voice AI Agent API")
+    await call_monitor.stop()
 
 
 def create_app() -> FastAPI:
@@ -44,36 +57,36 @@ def create_app() -> FastAPI:
         description="AI-powered voice agent with baresip and ElevenLabs integration",
         version="0.1.0",
         debug=settings.debug,
-        lifespan=lifespan
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
     )
     
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
+    # CORS нужен только браузерным клиентам; Baresip и мониторы ходят в API напрямую
+    if settings.cors_origins:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=settings.cors_origins,
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
     
     # Настройка Dishka DI
     setup_di(app)
     
     @app.get("/health")
     async def health_check():
-        return {
-            "status": "healthy",
-            "service": "voice-ai-agent"
-        }
+        return Response(content=HEALTH_RESPONSE_BODY, media_type="application/json")
     
     @app.exception_handler(Exception)
     async def global_exception_handler(request: Request, exc: Exception):
-        await logger.aerror(
+        logger.error(
             "Unhandled exception",
             path=request.url.path,
             method=request.method,
             error=str(exc)
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "detail": "Internal server error",
@@ -105,9 +105,10 @@ async def list_calls(
     call_service: FromDishka[CallService] = None
 ) -> CallListResponse:
     calls = await call_service.list_calls(limit=limit, offset=offset)
+    total = await call_service.count_calls()
     return CallListResponse(
         calls=calls,
-        total=len(calls)
+        total=total
     )
 
 
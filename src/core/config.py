@@ -1,3 +1,5 @@
+from functools import cached_property, lru_cache
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
@@ -16,14 +18,28 @@ class AudioConfig(BaseSettings):
     sample_rate_telephony: int = Field(default=8000, description="Telephony sample rate (Hz)")
     sample_rate_ai: int = Field(default=16000, description="AI sample rate (Hz)")
     chunk_size_ms: int = Field(default=20, description="Audio chunk size in milliseconds")
+    coalesce_max_chunks: int = Field(
+        default=4,
+        ge=1,
+        description="Max queued caller chunks merged into one send to the AI"
+    )
+    ai_queue_max_chunks: int = Field(
+        default=50,
+        ge=1,
+        description="Capacity of the AI-to-caller audio queue (chunks)"
+    )
+    ai_queue_drop_oldest: bool = Field(
+        default=False,
+        description="Drop the oldest AI chunk instead of pausing the WebSocket reader when the queue is full"
+    )
     
     model_config = SettingsConfigDict(env_prefix="AUDIO_")
     
-    @property
+    @cached_property
     def chunk_size_telephony(self) -> int:
         return int(self.sample_rate_telephony * self.chunk_size_ms / 1000)
     
-    @property
+    @cached_property
     def chunk_size_ai(self) -> int:
         return int(self.sample_rate_ai * self.chunk_size_ms / 1000)
 
@@ -35,6 +51,13 @@ class ElevenLabsConfig(BaseSettings):
         default="wss://api.elevenlabs.io/v1/convai/conversation",
         description="ElevenLabs WebSocket URL"
     )
+    optimize_streaming_latency: int = Field(
+        default=3,
+        ge=0,
+        le=4,
+        description="ElevenLabs streaming latency tier (0 - best quality, 4 - lowest latency)"
+    )
+    debug: bool = Field(default=False, description="Console tracing of the WebSocket handshake")
     
     model_config = SettingsConfigDict(env_prefix="ELEVENLABS_")
 
@@ -64,6 +87,7 @@ class Settings(BaseSettings):
     app_port: int = Field(default=8000)
     log_level: str = Field(default="INFO")
     debug: bool = Field(default=False)
+    cors_origins: list[str] = Field(default_factory=list)  # Пусто - CORS отключён (нет браузерных клиентов)
     
     # Baresip
     baresip_host: str = Field(default="localhost")
@@ -79,6 +103,8 @@ class Settings(BaseSettings):
     elevenlabs_api_key: str = Field(default="")
     elevenlabs_agent_id: str = Field(default="")
     elevenlabs_ws_url: str = Field(default="wss://api.elevenlabs.io/v1/convai/conversation")
+    elevenlabs_optimize_streaming_latency: int = Field(default=3, ge=0, le=4)
+    elevenlabs_debug: bool = Field(default=False)
     
     # Exolve
     exolve_api_key: str = Field(default="")
@@ -106,5 +132,6 @@ class Settings(BaseSettings):
     )
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     return Settings()
\ No newline at end of file
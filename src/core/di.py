@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from dishka import make_async_container
 from dishka.integrations.fastapi import setup_dishka
 
@@ -9,6 +11,7 @@ from src.infrastructure.di import (
 )
 
 
+@lru_cache(maxsize=1)
 def create_container():
     container = make_async_container(
         ConfigProvider(),
@@ -1,7 +1,8 @@
 import asyncio
-import base64
-import json
-from typing import Optional, Callable, Any, Protocol, Union
+import binascii
+import socket
+from contextlib import contextmanager, suppress
+from typing import Optional, Callable, Any, Iterator, Protocol, Union
 from dataclasses import dataclass
 from enum import Enum
 
@@ -9,10 +10,11 @@ import websockets
 import websockets.client
 from websockets_proxy import Proxy, proxy_connect
 import numpy as np
-import g711
+import orjson
 import structlog
 
 from src.infrastructure.audio.audio_types import AudioFrame
+from src.infrastructure.audio.ulaw import decode_ulaw
 
 
 class ElevenLabsConfig(Protocol):
@@ -20,10 +22,39 @@ class ElevenLabsConfig(Protocol):
     api_key: str
     agent_id: str
     ws_url: str
+    optimize_streaming_latency: int
+    debug: bool
 
 
 logger = structlog.get_logger()
 
+# Linux: TCP_CORK позволяет отправить несколько кадров одним TCP сегментом
+TCP_CORK: Optional[int] = getattr(socket, "TCP_CORK", None)
+
+# Шаблон input_audio_buffer.append: base64 не требует JSON экранирования
+APPEND_MESSAGE_PREFIX = b'{"type": "input_audio_buffer.append", "audio": "'
+APPEND_MESSAGE_SUFFIX = b'"}'
+
+
+def _decode_ulaw_8000(audio_bytes: bytes) -> tuple[np.ndarray, int]:
+    return decode_ulaw(audio_bytes), 8000
+
+
+def _decode_pcm_8000(audio_bytes: bytes) -> tuple[np.ndarray, int]:
+    return np.frombuffer(audio_bytes, dtype=np.int16), 8000
+
+
+def _decode_pcm_16000(audio_bytes: bytes) -> tuple[np.ndarray, int]:
+    return np.frombuffer(audio_bytes, dtype=np.int16), 16000
+
+
+# agent_output_audio_format -> декодер в (PCM int16, частота дискретизации)
+_AUDIO_DECODERS: dict[str, Callable[[bytes], tuple[np.ndarray, int]]] = {
+    "ulaw_8000": _decode_ulaw_8000,
+    "pcm_8000": _decode_pcm_8000,
+    "pcm_16000": _decode_pcm_16000,
+}
+
 
 class EventType(str, Enum):
     CONVERSATION_INITIATION = "conversation_initiation_metadata"
@@ -38,31 +69,57 @@ class EventType(str, Enum):
     PONG = "pong"
 
 
-@dataclass
+# Строковое значение -> EventType: dict.get вместо EventType(...) с ValueError на неизвестных
+_EVENT_BY_VALUE: dict[str, EventType] = {event.value: event for event in EventType}
+
+# Неизменяемые управляющие сообщения сериализуем один раз при импорте
+COMMIT_MESSAGE = orjson.dumps({"type": EventType.INPUT_AUDIO_BUFFER_COMMIT.value}).decode()
+CLEAR_MESSAGE = orjson.dumps({"type": EventType.INPUT_AUDIO_BUFFER_CLEAR.value}).decode()
+INTERRUPTION_MESSAGE = orjson.dumps({"type": EventType.INTERRUPTION.value}).decode()
+PONG_MESSAGE = orjson.dumps({"type": EventType.PONG.value}).decode()
+
+# Ключ-обёртка события -> (тип события, поле с base64 аудио внутри обёртки)
+_EVENT_ENVELOPES: dict[str, tuple[str, Optional[str]]] = {
+    "audio_event": ("audio", "audio_base_64"),
+    "agent_response_event": ("agent_response", "audio_base_64"),
+    "ping_event": ("ping", None),
+    "conversation_initiation_metadata_event": ("conversation_initiation_metadata", None),
+}
+
+
+@dataclass(slots=True, frozen=True)
 class ElevenLabsEvent:
     type: EventType
     data: dict[str, Any]
+    audio_base64: Optional[str] = None
 
 
 class ElevenLabsClient:
     def __init__(self, config: ElevenLabsConfig, proxy_config: Optional[dict] = None) -> None:
         self.config = config
         self.proxy_config = proxy_config
+        # Консольная трассировка подключения (print) - только при ELEVENLABS_DEBUG=true в настройках
+        self._debug = bool(self._cfg("debug", False))
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
         self._running = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         
         self.audio_format: str = "pcm_16000"
         self.output_format: str = "ulaw_8000"
+        # Декодер выбирается один раз по output_format, а не на каждый пакет
+        self._decode_audio = _AUDIO_DECODERS.get(self.output_format)
         
         self._on_audio_callback: Optional[Callable[[AudioFrame], None]] = None
         self._on_transcript_callback: Optional[Callable[[str, bool], None]] = None
         
-        self._audio_buffer: list[bytes] = []
+        self._audio_buffer = bytearray()
         self._buffer_duration_ms = 100
+        # Для 16kHz, 16-bit (2 bytes per sample)
+        self._expected_buffer_bytes = 16000 * 2 * self._buffer_duration_ms // 1000
+        self._append_message = bytearray(APPEND_MESSAGE_PREFIX)
         
-        # Ping-pong для поддержания соединения
-        self._ping_task: Optional[asyncio.Task] = None
-        self._ping_interval = 20  # секунд
+        # Keepalive: ping фреймы самого протокола WebSocket (секунды)
+        self._ping_interval = 20
         
     def _cfg(self, key: str, default: Optional[Any] = None) -> Any:
         """Helper to read values from config whether it's an object or dict."""
@@ -82,11 +139,16 @@ class ElevenLabsClient:
         
         logger.info("🔌 CONNECTING TO ELEVENLABS WEBSOCKET API")
         logger.info(f"Agent ID: {self._cfg('agent_id')}")
-        print(f"[ElevenLabs] 🔌 Connecting to WebSocket...")
+        if self._debug:
+            print(f"[ElevenLabs] 🔌 Connecting to WebSocket...")
         
         try:
             url_base = self._cfg("ws_url", "wss://api.elevenlabs.io/v1/convai/conversation")
             url = f"{url_base}?agent_id={self._cfg('agent_id')}"
+            latency_tier = self._cfg("optimize_streaming_latency")
+            if latency_tier is not None:
+                # Меньше буферизации TTS на сервере - раньше первый аудио чанк
+                url += f"&optimize_streaming_latency={latency_tier}"
             headers = {
                 "xi-api-key": self._cfg('api_key'),
             }
@@ -113,7 +175,9 @@ class ElevenLabsClient:
                 self.websocket = await proxy_connect(
                     url,
                     proxy=proxy,
-                    extra_headers=headers
+                    extra_headers=headers,
+                    ping_interval=self._ping_interval,
+                    ping_timeout=self._ping_interval
                 )
                 
                 logger.info("✅ Connected to ElevenLabs through proxy successfully!")
@@ -126,53 +190,62 @@ class ElevenLabsClient:
                 try:
                     self.websocket = await websockets.connect(
                         url,
-                        additional_headers=headers
+                        additional_headers=headers,
+                        ping_interval=self._ping_interval,
+                        ping_timeout=self._ping_interval
                     )
                 except TypeError:
                     # Fallback для старых версий
                     self.websocket = await websockets.client.connect(
                         url,
-                        extra_headers=headers
+                        extra_headers=headers,
+                        ping_interval=self._ping_interval,
+                        ping_timeout=self._ping_interval
                     )
             
             self._running = True
-            print(f"[ElevenLabs] ✅ WebSocket connected")
+            self._loop = asyncio.get_running_loop()
+            if self._debug:
+                print(f"[ElevenLabs] ✅ WebSocket connected")
             
             # Ожидаем начальное событие
-            print(f"[ElevenLabs] ⏳ Waiting for init event...")
+            if self._debug:
+                print(f"[ElevenLabs] ⏳ Waiting for init event...")
             init_event = await self._receive_event()
-            print(f"[ElevenLabs] 📥 Received event: {init_event.type if init_event else 'None'}")
+            if self._debug:
+                print(f"[ElevenLabs] 📥 Received event: {init_event.type if init_event else 'None'}")
             if init_event and init_event.type == EventType.CONVERSATION_INITIATION:
                 # Данные находятся прямо в корне события
                 self.audio_format = init_event.data.get("user_input_audio_format", "pcm_16000")
                 self.output_format = init_event.data.get("agent_output_audio_format", "pcm_16000")
+                self._decode_audio = _AUDIO_DECODERS.get(self.output_format)
                 
                 logger.info(
                     "Received conversation initiation",
                     audio_format=self.audio_format,
                     output_format=self.output_format
                 )
-                print(f"[ElevenLabs] 🎬 Conversation initialized, audio format: {self.output_format}")
+                if self._debug:
+                    print(f"[ElevenLabs] 🎬 Conversation initialized, audio format: {self.output_format}")
                 
                 # КРИТИЧНО: Отправляем conversation_initiation_metadata обратно!
-                await self.websocket.send(json.dumps({
+                await self.websocket.send(orjson.dumps({
                     "type": "conversation_initiation_metadata",
                     "conversation_initiation_metadata_event": {
                         "conversation_id": init_event.data.get("conversation_id", ""),
                         "agent_output_audio_format": self.output_format
                     }
-                }))
+                }).decode())
                 logger.info("Sent conversation_initiation_metadata response")
-                print(f"[ElevenLabs] ✅ Handshake completed")
+                if self._debug:
+                    print(f"[ElevenLabs] ✅ Handshake completed")
             else:
                 logger.warning(f"Unexpected init event: {init_event}")
             
-            # Запускаем ping задачу ПОСЛЕ handshake
-            self._ping_task = asyncio.create_task(self._ping_loop())
-            
         except Exception as e:
             logger.error("Failed to connect to ElevenLabs", error=str(e))
-            print(f"[ElevenLabs] ❌ Connection failed: {e}")
+            if self._debug:
+                print(f"[ElevenLabs] ❌ Connection failed: {e}")
             raise
     
     async def disconnect(self) -> None:
@@ -181,15 +254,6 @@ class ElevenLabsClient:
         
         self._running = False
         
-        # Останавливаем ping задачу
-        if self._ping_task:
-            self._ping_task.cancel()
-            try:
-                await self._ping_task
-            except asyncio.CancelledError:
-                pass
-            self._ping_task = None
-        
         if self.websocket:
             await self.websocket.close()
             self.websocket = None
@@ -202,50 +266,44 @@ class ElevenLabsClient:
         
         try:
             message = await self.websocket.recv()
-            if isinstance(message, (bytes, bytearray)):
-                # Expect JSON text messages; if bytes, decode first
-                message = message.decode("utf-8", errors="ignore")
-            data = json.loads(message)
+            # orjson принимает и str, и bytes
+            data = orjson.loads(message)
             
             # Обрабатываем структуру ElevenLabs событий
             event_type = data.get("type")
+            audio_base64 = data.get("audio") or data.get("audio_base_64")
+            
+            # Один проход по ключам-обёрткам: тип (если его нет в корне) и аудио
+            for envelope, (envelope_type, audio_field) in _EVENT_ENVELOPES.items():
+                payload = data.get(envelope)
+                if payload is None:
+                    continue
+                if audio_field and not audio_base64:
+                    audio_base64 = payload.get(audio_field)
+                if not event_type:
+                    event_type = envelope_type
+                    if audio_field is None:
+                        # Перемещаем данные на верхний уровень
+                        data.update(payload)
+                break
             
-            # Если type не найден в корне, ищем в подобъектах
             if not event_type:
-                # Проверяем альтернативные форматы событий
-                if "audio_event" in data:
-                    event_type = "audio"
-                    # Извлекаем аудио данные из вложенного объекта
-                    if "audio_base_64" in data["audio_event"]:
-                        data["audio"] = data["audio_event"]["audio_base_64"]
-                elif "agent_response_event" in data:
-                    event_type = "agent_response" 
-                    # Извлекаем аудио из agent_response_event
-                    if "audio_base_64" in data["agent_response_event"]:
-                        data["audio"] = data["agent_response_event"]["audio_base_64"]
-                elif "ping_event" in data:
-                    event_type = "ping"
-                elif "conversation_initiation_metadata_event" in data:
-                    event_type = "conversation_initiation_metadata"
-                    # Перемещаем данные на верхний уровень
-                    data.update(data["conversation_initiation_metadata_event"])
-                else:
-                    logger.debug(f"Unknown event structure: {list(data.keys())}")
-                    return None
+                logger.debug("Unknown event structure", keys=list(data))
+                return None
             
             # Обрабатываем известные типы событий
-            try:
-                event_type_enum = EventType(event_type)
-            except ValueError:
+            event_type_enum = _EVENT_BY_VALUE.get(event_type)
+            if event_type_enum is None:
                 # Неизвестный тип события - логируем и пропускаем
-                logger.debug(f"Unknown event type: {event_type}")
+                logger.debug("Unknown event type", event_type=event_type)
                 return None
             
             return ElevenLabsEvent(
                 type=event_type_enum,
-                data=data
+                data=data,
+                audio_base64=audio_base64
             )
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error("Failed to decode message", error=str(e))
             return None
         except Exception as e:
@@ -258,32 +316,50 @@ class ElevenLabsClient:
             return
         
         try:
-            self._audio_buffer.append(audio_bytes)
-            
-            buffer_size = sum(len(chunk) for chunk in self._audio_buffer)
-            # Для 16kHz, 16-bit (2 bytes per sample)
-            expected_size = int(16000 * self._buffer_duration_ms / 1000 * 2)
+            self._audio_buffer += audio_bytes
             
-            if buffer_size >= expected_size:
-                combined_audio = b''.join(self._audio_buffer)
+            if len(self._audio_buffer) >= self._expected_buffer_bytes:
+                # Собираем JSON по шаблону в переиспользуемом буфере, без json.dumps
+                message = self._append_message
+                del message[len(APPEND_MESSAGE_PREFIX):]
+                with memoryview(self._audio_buffer) as audio_view:
+                    message += binascii.b2a_base64(audio_view, newline=False)
+                message += APPEND_MESSAGE_SUFFIX
                 self._audio_buffer.clear()
                 
-                audio_base64 = base64.b64encode(combined_audio).decode('ascii')
-                
-                await self.websocket.send(json.dumps({
-                    "type": EventType.INPUT_AUDIO_BUFFER_APPEND.value,
-                    "audio": audio_base64
-                }))
-                
-                await self.websocket.send(json.dumps({
-                    "type": EventType.INPUT_AUDIO_BUFFER_COMMIT.value
-                }))
+                # append + commit уходят в сеть одним сегментом
+                with self._corked_socket():
+                    await self.websocket.send(message.decode('ascii'))
+                    
+                    await self.websocket.send(COMMIT_MESSAGE)
         except websockets.exceptions.ConnectionClosed:
             logger.error("WebSocket connection closed while sending audio")
             self._running = False
         except Exception as e:
             logger.error(f"Error sending audio: {e}")
     
+    @contextmanager
+    def _corked_socket(self) -> Iterator[None]:
+        """Копит записанные кадры в ядре и отправляет их разом при выходе (аналог feed + flush)"""
+        sock = None
+        if TCP_CORK is not None and self.websocket:
+            transport = getattr(self.websocket, "transport", None)
+            if transport:
+                sock = transport.get_extra_info("socket")
+        
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, TCP_CORK, 1)
+            except OSError:
+                sock = None
+        
+        try:
+            yield
+        finally:
+            if sock is not None:
+                with suppress(OSError):
+                    sock.setsockopt(socket.IPPROTO_TCP, TCP_CORK, 0)
+    
     async def receive_audio(self) -> Optional[bytes]:
         """Получает аудио данные из WebSocket"""
         if not self._running or not self.websocket:
@@ -298,24 +374,14 @@ class ElevenLabsClient:
                     return None
                 # Обрабатываем аудио от агента
                 elif event.type == EventType.AUDIO or event.type == EventType.AGENT_RESPONSE:
-                    # AGENT_RESPONSE содержит и audio и текст
-                    audio_base64 = event.data.get("audio")
-                    if not audio_base64:
-                        # Проверяем вложенные структуры (audio_event, audio_base_64)
-                        if "audio_event" in event.data:
-                            audio_base64 = event.data["audio_event"].get("audio_base_64")
-                        elif "audio_base_64" in event.data:
-                            audio_base64 = event.data.get("audio_base_64")
-                        elif "agent_response_event" in event.data:
-                            audio_base64 = event.data["agent_response_event"].get("audio_base_64")
-                    
-                    if audio_base64:
-                        decoded = base64.b64decode(audio_base64)
-                        logger.debug(f"Decoded audio chunk: {len(decoded)} bytes")
+                    # AGENT_RESPONSE содержит и audio и текст; аудио извлечено в _receive_event
+                    if event.audio_base64:
+                        decoded = binascii.a2b_base64(event.audio_base64)
+                        logger.debug("Decoded audio chunk", size=len(decoded))
                         return decoded
                 # Игнорируем другие события (USER_TRANSCRIPT и т.д.)
                 elif event.type in [EventType.USER_TRANSCRIPT, EventType.INTERRUPTION]:
-                    logger.debug(f"Ignoring event: {event.type}")
+                    logger.debug("Ignoring event", event_type=event.type)
                     return None
         except websockets.exceptions.ConnectionClosed as e:
             # Проверяем причину закрытия
@@ -353,37 +419,16 @@ class ElevenLabsClient:
         
         self._audio_buffer.clear()
         
-        await self.websocket.send(json.dumps({
-            "type": EventType.INPUT_AUDIO_BUFFER_CLEAR.value
-        }))
+        await self.websocket.send(CLEAR_MESSAGE)
     
     async def interrupt(self) -> None:
         if not self.websocket:
             return
         
-        await self.websocket.send(json.dumps({
-            "type": EventType.INTERRUPTION.value
-        }))
+        await self.websocket.send(INTERRUPTION_MESSAGE)
         
         await self.clear_audio_buffer()
     
-    async def _ping_loop(self) -> None:
-        """Периодически отправляет ping для поддержания соединения"""
-        while self._running:
-            try:
-                await asyncio.sleep(self._ping_interval)
-                
-                if self.websocket and not self.websocket.closed:
-                    await self.websocket.send(json.dumps({
-                        "type": EventType.PING.value
-                    }))
-                    logger.debug("Sent ping to keep connection alive")
-                    
-            except Exception as e:
-                logger.error(f"Error in ping loop: {e}")
-                # Не прерываем цикл при ошибке
-                continue
-    
     async def process_events(self) -> None:
         while self._running:
             event = await self._receive_event()
@@ -391,8 +436,8 @@ class ElevenLabsClient:
                 continue
             
             try:
-                if event.type == EventType.AUDIO_CHUNK:
-                    await self._handle_audio_chunk(event.data)
+                if event.type == EventType.AUDIO:
+                    await self._handle_audio_chunk(event)
                 elif event.type == EventType.USER_TRANSCRIPT:
                     await self._handle_transcript(event.data, is_user=True)
                 elif event.type == EventType.AGENT_RESPONSE:
@@ -406,30 +451,21 @@ class ElevenLabsClient:
                     error=str(e)
                 )
     
-    async def _handle_audio_chunk(self, data: dict[str, Any]) -> None:
-        audio_base64 = data.get("audio")
+    async def _handle_audio_chunk(self, event: ElevenLabsEvent) -> None:
+        audio_base64 = event.audio_base64
         if not audio_base64:
             return
         
-        audio_bytes = base64.b64decode(audio_base64)
-        
-        if self.output_format == "ulaw_8000":
-            ulaw_data = np.frombuffer(audio_bytes, dtype=np.uint8)
-            pcm_data = g711.decode_ulaw(ulaw_data)
-        elif self.output_format == "pcm_8000":
-            pcm_data = np.frombuffer(audio_bytes, dtype=np.int16)
-        elif self.output_format == "pcm_16000":
-            pcm_data = np.frombuffer(audio_bytes, dtype=np.int16)
-        else:
+        if self._decode_audio is None:
             logger.warning(f"Unsupported output format: {self.output_format}")
             return
         
-        sample_rate = 8000 if "8000" in self.output_format else 16000
+        pcm_data, sample_rate = self._decode_audio(binascii.a2b_base64(audio_base64))
         
         frame = AudioFrame(
             data=pcm_data,
             sample_rate=sample_rate,
-            timestamp=asyncio.get_event_loop().time()
+            timestamp=self._loop.time()
         )
         
         if self._on_audio_callback:
@@ -442,9 +478,7 @@ class ElevenLabsClient:
     
     async def _handle_ping(self) -> None:
         if self.websocket:
-            await self.websocket.send(json.dumps({
-                "type": EventType.PONG
-            }))
+            await self.websocket.send(PONG_MESSAGE)
     
     def set_audio_callback(self, callback: Callable[[AudioFrame], None]) -> None:
         self._on_audio_callback = callback
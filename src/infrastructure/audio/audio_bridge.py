@@ -1,6 +1,7 @@
 import asyncio
+from collections import deque
 import numpy as np
-from typing import Optional, Callable, Any
+from typing import Optional, Callable, Any, AsyncIterator
 from dataclasses import dataclass
 import queue
 import threading
@@ -10,11 +11,17 @@ from scipy.signal import resample_poly
 import structlog
 
 from src.infrastructure.audio.audio_types import AudioFrame
+from src.infrastructure.audio.audio_transport import RESAMPLE_2X_FILTER, resample_linear
 from src.core.config import AudioConfig
 
 
 logger = structlog.get_logger()
 
+# Буферы входного аудио переиспользуются, чтобы не аллоцировать в callback PortAudio
+INPUT_FRAME_POOL_SIZE = 32
+# Не больше секунды захваченного аудио (50 блоков по 20мс); старые блоки вытесняются
+INPUT_QUEUE_MAXLEN = 50
+
 
 class AudioBridge:
     def __init__(self, config: AudioConfig) -> None:
@@ -22,11 +29,15 @@ class AudioBridge:
         self.input_stream: Optional[sd.InputStream] = None
         self.output_stream: Optional[sd.OutputStream] = None
         
-        self.input_queue: asyncio.Queue[AudioFrame] = asyncio.Queue()
+        # (буфер из пула, timestamp) - AudioFrame собирается уже в read_frame.
+        # Заполняется из потока PortAudio, поэтому deque + Event вместо asyncio.Queue
+        self.input_queue: deque[tuple[np.ndarray, float]] = deque(maxlen=INPUT_QUEUE_MAXLEN)
+        self._input_ready = asyncio.Event()
         self.output_queue: asyncio.Queue[AudioFrame] = asyncio.Queue()
         
         self._running = False
         self._input_callback: Optional[Callable[[AudioFrame], None]] = None
+        self._frame_pool: deque[np.ndarray] = deque()
         
     async def start(self) -> None:
         if self._running:
@@ -45,6 +56,8 @@ class AudioBridge:
             return
             
         self._running = False
+        # Будим итератор фреймов, чтобы он увидел остановку
+        self._input_ready.set()
         
         if self.input_stream:
             self.input_stream.stop()
@@ -73,21 +86,28 @@ class AudioBridge:
         if output_device is None:
             raise ValueError(f"Output device '{self.config.out_device}' not found")
         
+        chunk_size = self.config.chunk_size_telephony
+        frame_pool = self._frame_pool
+        frame_pool.extend(np.empty(chunk_size, dtype=np.int16) for _ in range(INPUT_FRAME_POOL_SIZE))
+        input_queue = self.input_queue
+        loop = asyncio.get_running_loop()
+        
         def input_callback(indata: np.ndarray, frames: int, time_info: Any, status: Any) -> None:
             if status:
                 logger.warning("Input audio status", status=status)
             
             if self._running and self._input_callback:
-                frame = AudioFrame(
-                    data=indata.copy().flatten(),
-                    sample_rate=self.config.sample_rate_telephony,
-                    timestamp=time_info.inputBufferAdcTime
-                )
+                # deque.popleft/append атомарны - пул безопасно делить с потоком asyncio
+                buffer = frame_pool.popleft() if frame_pool and frames == chunk_size else None
+                if buffer is None:
+                    buffer = np.empty(frames, dtype=np.int16)
+                np.copyto(buffer, indata[:, 0])
                 
-                try:
-                    self.input_queue.put_nowait(frame)
-                except asyncio.QueueFull:
-                    logger.warning("Input queue full, dropping frame")
+                if len(input_queue) == INPUT_QUEUE_MAXLEN:
+                    logger.warning("Input queue full, dropping oldest frame")
+                input_queue.append((buffer, time_info.inputBufferAdcTime))
+                # Event принадлежит циклу событий - будим его потокобезопасно
+                loop.call_soon_threadsafe(self._input_ready.set)
         
         self.input_stream = sd.InputStream(
             device=input_device,
@@ -125,38 +145,65 @@ class AudioBridge:
             return audio
         
         if from_rate == 8000 and to_rate == 16000:
-            return resample_poly(audio, 2, 1).astype(np.int16)
+            return resample_poly(audio, 2, 1, window=RESAMPLE_2X_FILTER).astype(np.int16)
         elif from_rate == 16000 and to_rate == 8000:
-            return resample_poly(audio, 1, 2).astype(np.int16)
+            return resample_poly(audio, 1, 2, window=RESAMPLE_2X_FILTER).astype(np.int16)
         else:
             ratio = to_rate / from_rate
             new_length = int(len(audio) * ratio)
-            return np.interp(
-                np.linspace(0, len(audio) - 1, new_length),
-                np.arange(len(audio)),
-                audio
-            ).astype(np.int16)
+            return resample_linear(audio, new_length)
     
     async def read_frame(self) -> Optional[AudioFrame]:
-        try:
-            frame = await asyncio.wait_for(
-                self.input_queue.get(),
-                timeout=0.1
-            )
-            
-            resampled_data = self.resample_audio(
-                frame.data,
-                self.config.sample_rate_telephony,
-                self.config.sample_rate_ai
-            )
-            
-            return AudioFrame(
-                data=resampled_data,
-                sample_rate=self.config.sample_rate_ai,
-                timestamp=frame.timestamp
-            )
-        except asyncio.TimeoutError:
-            return None
+        if not self.input_queue:
+            self._input_ready.clear()
+            try:
+                async with asyncio.timeout(0.1):
+                    await self._input_ready.wait()
+            except asyncio.TimeoutError:
+                return None
+            # Event мог быть выставлен блоком, который уже забрали
+            if not self.input_queue:
+                return None
+        
+        return self._drain_input()
+    
+    def __aiter__(self) -> AsyncIterator[AudioFrame]:
+        return self._iter_frames()
+    
+    async def _iter_frames(self) -> AsyncIterator[AudioFrame]:
+        """Фреймы по мере захвата: ждём без таймаута, одно пробуждение на пришедшие блоки"""
+        while self._running:
+            if not self.input_queue:
+                self._input_ready.clear()
+                await self._input_ready.wait()
+                if not self.input_queue:
+                    continue
+            yield self._drain_input()
+    
+    def _drain_input(self) -> AudioFrame:
+        # Забираем всё накопленное сразу и ресэмплируем одним вызовом
+        buffers = []
+        timestamp = self.input_queue[0][1]
+        while self.input_queue:
+            buffers.append(self.input_queue.popleft()[0])
+        audio = buffers[0] if len(buffers) == 1 else np.concatenate(buffers)
+        
+        resampled_data = self.resample_audio(
+            audio,
+            self.config.sample_rate_telephony,
+            self.config.sample_rate_ai
+        )
+        
+        # Ресэмплинг вернул новый массив - буферы можно вернуть в пул
+        if resampled_data is not audio:
+            chunk_size = self.config.chunk_size_telephony
+            self._frame_pool.extend(buffer for buffer in buffers if len(buffer) == chunk_size)
+        
+        return AudioFrame(
+            data=resampled_data,
+            sample_rate=self.config.sample_rate_ai,
+            timestamp=timestamp
+        )
     
     async def write_frame(self, frame: AudioFrame) -> None:
         resampled_data = self.resample_audio(
@@ -3,7 +3,7 @@
 """
 
 import asyncio
-from typing import Optional
+from typing import Callable, Optional
 from dataclasses import dataclass
 
 import structlog
@@ -13,8 +13,10 @@ from src.infrastructure.audio.audio_transport import (
     NamedPipeTransport,
     AudioConfig,
     AudioFormat,
-    AudioResampler
+    AudioResampler,
+    FrameSlab
 )
+from src.infrastructure.audio.ulaw import decode_ulaw
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -24,7 +26,7 @@ if TYPE_CHECKING:
 logger = structlog.get_logger()
 
 
-@dataclass
+@dataclass(slots=True)
 class BridgeMetrics:
     """Метрики работы моста"""
     packets_from_caller: int = 0
@@ -36,6 +38,7 @@ class BridgeMetrics:
     bytes_from_ai: int = 0
     bytes_to_ai: int = 0
     resampling_operations: int = 0
+    dropped_frames: int = 0
     errors: int = 0
 
 
@@ -76,39 +79,53 @@ class AudioBridgeWebSocket:
         from src.infrastructure.ai.elevenlabs_client import ElevenLabsClient
         self.elevenlabs = ElevenLabsClient(elevenlabs_config, proxy_config)
         
-        # Ресэмплер
+        # Ресэмплеры: у каждого своя история фильтра, поэтому ответу AI (8k -> 16k) - отдельный
         self.resampler = AudioResampler()
+        self._ai_resampler = AudioResampler()
         
         # Состояние
         self._running = False
         self._tasks: list[asyncio.Task] = []
         self.metrics = BridgeMetrics()
         
+        self._coalesce_max_chunks = audio_config.coalesce_max_chunks
+        
         # Очереди для буферизации
         self._to_ai_queue: asyncio.Queue = asyncio.Queue(maxsize=50)
-        self._from_ai_queue: asyncio.Queue = asyncio.Queue(maxsize=50)
+        # Слоты под кадры 16kHz для _to_ai_queue (чуть больше maxsize очереди)
+        self._to_ai_slab = FrameSlab(
+            frame_bytes=audio_config.sample_rate_ai * audio_config.chunk_size_ms // 1000 * 2,
+            slots=64
+        )
+        self._from_ai_queue: asyncio.Queue = asyncio.Queue(maxsize=audio_config.ai_queue_max_chunks)
+        self._ai_queue_drop_oldest = audio_config.ai_queue_drop_oldest
+        
+        # Нормализация выбирается один раз после подключения; None - уже PCM 16kHz
+        self._normalize_ai: Optional[Callable[[bytes], bytes]] = None
 
-    def _normalize_ai_audio_to_pcm16k(self, audio_bytes: bytes) -> bytes:
-        """Ensure AI audio is PCM 16kHz 16-bit for downstream processing.
-        ElevenLabs may return 'ulaw_8000' or 'pcm_8000' depending on agent settings.
-        """
+    def _select_ai_normalizer(self) -> Optional[Callable[[bytes], bytes]]:
+        """ElevenLabs may return 'ulaw_8000' or 'pcm_8000' depending on agent settings."""
         fmt = getattr(self.elevenlabs, "output_format", "pcm_16000") or "pcm_16000"
-        try:
-            if fmt == "ulaw_8000":
-                import g711
-                # Decode μ-law (uint8) -> PCM16 at 8kHz
-                ulaw = bytes(audio_bytes)
-                pcm8 = g711.decode_ulaw(ulaw)
-                # g711 may return numpy array or bytes; ensure bytes
-                if hasattr(pcm8, "tobytes"):
-                    pcm8 = pcm8.tobytes()
-                # Upsample to 16kHz
-                return self.resampler.resample_pcm(pcm8, from_rate=8000, to_rate=16000)
-            elif fmt == "pcm_8000":
-                # Direct upsample to 16kHz
-                return self.resampler.resample_pcm(audio_bytes, from_rate=8000, to_rate=16000)
-            # Default: already pcm_16000
+        return {
+            "ulaw_8000": self._normalize_ulaw_8000,
+            "pcm_8000": self._normalize_pcm_8000,
+        }.get(fmt)
+
+    def _normalize_ulaw_8000(self, audio_bytes: bytes) -> bytes:
+        # Decode μ-law (uint8) -> PCM16 at 8kHz via lookup table and upsample to 16kHz
+        # straight from the decoded array, without a bytes round trip
+        return self._ai_resampler.resample_samples(decode_ulaw(audio_bytes), from_rate=8000, to_rate=16000)
+
+    def _normalize_pcm_8000(self, audio_bytes: bytes) -> bytes:
+        # Direct upsample to 16kHz
+        return self._ai_resampler.resample_pcm(audio_bytes, from_rate=8000, to_rate=16000)
+
+    def _normalize_ai_audio_to_pcm16k(self, audio_bytes: bytes) -> bytes:
+        """Ensure AI audio is PCM 16kHz 16-bit for downstream processing."""
+        if self._normalize_ai is None:
             return audio_bytes
+        try:
+            return self._normalize_ai(audio_bytes)
         except Exception:
             # Fallback: return as-is to avoid breaking flow
             return audio_bytes
@@ -133,7 +150,6 @@ class AudioBridgeWebSocket:
             asyncio.create_task(self._process_caller_to_ai(), name="caller_to_ai")
         ]
         logger.info("Started audio reader task, buffering audio from pipes")
-        print("[Bridge] 📡 Reader task started; waiting for SIP 200 connect signal")
         
         # НЕ подключаемся к ElevenLabs!
         # Это будет сделано позже при реальном ответе (SIP 200 OK)
@@ -147,15 +163,14 @@ class AudioBridgeWebSocket:
             return
             
         logger.info("🔌 CONNECTING TO ELEVENLABS WEBSOCKET (SIP 200 OK received)")
-        print("[Bridge] 🔌 CONNECTING TO ELEVENLABS WEBSOCKET")
         logger.info("Starting ElevenLabs WebSocket connection...")
-        logger.info(f"   Transport type: {type(self.transport).__name__}")
-        logger.info(f"   Transport running: {hasattr(self.transport, '_running') and self.transport._running}")
+        self._log_transport_state()
         
         # Подключаемся к ElevenLabs
         logger.info("Connecting to ElevenLabs API...")
         await self.elevenlabs.connect()
         logger.info("ElevenLabs API connected successfully")
+        self._normalize_ai = self._select_ai_normalizer()
         print("[Bridge] ✅ ElevenLabs WebSocket connected")
         
         # Добавляем остальные задачи обработки (caller_to_ai уже запущен)
@@ -170,7 +185,14 @@ class AudioBridgeWebSocket:
         logger.info(f"Started {len(additional_tasks)} additional tasks, total: {len(self._tasks)}")
         
         logger.info("WebSocket connected and audio bridge fully started")
-        print("[Bridge] ✅ Audio bridge fully started (WS + queues)")
+    
+    def _log_transport_state(self) -> None:
+        """Тип и состояние транспорта одной строкой лога"""
+        logger.info(
+            "Transport state",
+            type=type(self.transport).__name__,
+            running=getattr(self.transport, "_running", False),
+        )
     
     async def start(self) -> None:
         """Старый метод для совместимости - НЕ ИСПОЛЬЗОВАТЬ!"""
@@ -210,9 +232,7 @@ class AudioBridgeWebSocket:
     async def _process_caller_to_ai(self) -> None:
         """Обработка аудио от звонящего к AI"""
         logger.info("🎤 Started caller_to_ai task - reading from pipes")
-        logger.info(f"   Transport: {type(self.transport).__name__}")
-        logger.info(f"   Transport running: {hasattr(self.transport, '_running') and self.transport._running}")
-        chunks_read = 0
+        self._log_transport_state()
         empty_reads = 0
         
         while self._running:
@@ -221,27 +241,21 @@ class AudioBridgeWebSocket:
                 chunk = await self.transport.read_chunk()
                 if not chunk:
                     empty_reads += 1
-                    if empty_reads % 1000 == 0:  # Логируем каждую 1000-ю пустую попытку
+                    # read_chunk сам ждёт данные до 100мс - пауза здесь не нужна
+                    if empty_reads % 100 == 0:  # Логируем каждую 100-ю пустую попытку (~10с)
                         logger.info(f"⚠️ No audio from pipe: {empty_reads} empty reads")
-                    await asyncio.sleep(0.001)
                     continue
                 
-                chunks_read += 1
-                if chunks_read == 1:
-                    logger.info(f"🎉 FIRST AUDIO CHUNK RECEIVED! Size={len(chunk)} bytes")
-                    print(f"[Bridge] 🎉 First caller audio chunk: {len(chunk)} bytes")
-                elif chunks_read % 50 == 0:  # Логируем каждый 50-й чанк
-                    logger.info(f"📊 Audio flowing: chunk #{chunks_read}, size={len(chunk)} bytes")
-                
+                # Прогресс и первый чанк логирует _monitor_metrics, а не горячий цикл
                 self.metrics.packets_from_caller += 1
                 self.metrics.bytes_from_caller += len(chunk)
                 
-                # Ресэмплинг 8kHz → 16kHz
-                resampled = self.resampler.resample_pcm(
-                    chunk, 
-                    from_rate=8000, 
-                    to_rate=16000
-                )
+                # Ресэмплинг 8kHz → 16kHz прямо в слот; без свободного слота - обычный bytes.
+                # Одно умножение на готовую матрицу - быстрее, чем переход в поток и обратно
+                slot = self._to_ai_slab.acquire()
+                resampled = self.resampler.resample_pcm(chunk, 8000, 16000, slot)
+                if slot is not None and resampled is not slot:
+                    self._to_ai_slab.release(slot)
                 self.metrics.resampling_operations += 1
                 
                 # Кладём в очередь для отправки
@@ -255,56 +269,38 @@ class AudioBridgeWebSocket:
     async def _process_ai_to_caller(self) -> None:
         """Обработка аудио от AI к звонящему"""
         logger.info("🔊 Started ai_to_caller task - writing to pipes")
-        print("[Bridge] 🔊 AI-to-caller task started")
         audio_buffer = bytearray()  # Буфер для накопления аудио
+        head = 0  # Смещение непрочитанных данных в audio_buffer
         chunk_size_16k = 640  # 20ms при 16kHz (16000 * 0.02 * 2 bytes)
-        chunks_written = 0
         
         while self._running:
             try:
                 # Получаем из очереди от AI
-                chunk = await asyncio.wait_for(
-                    self._from_ai_queue.get(),
-                    timeout=0.1
-                )
+                async with asyncio.timeout(0.1):
+                    chunk = await self._from_ai_queue.get()
                 
                 self.metrics.packets_from_ai += 1
                 self.metrics.bytes_from_ai += len(chunk)
                 
-                # Добавляем в буфер
+                # Добавляем в буфер; прочитанное начало вырезаем редко, а не на каждом чанке
+                if head and (head == len(audio_buffer) or head > 65536):
+                    del audio_buffer[:head]
+                    head = 0
                 audio_buffer.extend(chunk)
                 
-                # Логируем первый чанк от AI
-                if self.metrics.packets_from_ai == 1:
-                    logger.info(f"🎉 FIRST AI AUDIO IN QUEUE! Size={len(chunk)} bytes")
-                    print(f"[Bridge] 🎤 First AI audio received: {len(chunk)} bytes, buffered: {len(audio_buffer)} bytes")
-                elif self.metrics.packets_from_ai % 10 == 0:
-                    logger.info(f"📊 Processing AI audio: packet #{self.metrics.packets_from_ai}")
-                
                 # Отправляем по частям размером 20ms
-                while len(audio_buffer) >= chunk_size_16k:
+                while len(audio_buffer) - head >= chunk_size_16k:
                     # Берём ровно 20ms аудио
-                    chunk_to_send = bytes(audio_buffer[:chunk_size_16k])
-                    audio_buffer = audio_buffer[chunk_size_16k:]
+                    chunk_to_send = audio_buffer[head:head + chunk_size_16k]
+                    head += chunk_size_16k
                     
                     # Ресэмплинг 16kHz → 8kHz
-                    resampled = self.resampler.resample_pcm(
-                        chunk_to_send,
-                        from_rate=16000,
-                        to_rate=8000
-                    )
+                    resampled = self.resampler.resample_pcm(chunk_to_send, 16000, 8000)
                     self.metrics.resampling_operations += 1
                     
                     # Отправляем в Baresip (должно быть ровно 320 байт)
                     await self.transport.write_chunk(resampled)
                     
-                    chunks_written += 1
-                    if chunks_written == 1:
-                        logger.info(f"🎉 FIRST CHUNK WRITTEN TO PIPE! Size={len(resampled)} bytes")
-                        print(f"[Bridge] ✅ First chunk written to Baresip pipe: {len(resampled)} bytes")
-                    elif chunks_written % 50 == 0:
-                        logger.info(f"📊 Written {chunks_written} chunks to pipe")
-                    
                     self.metrics.packets_to_caller += 1
                     self.metrics.bytes_to_caller += len(resampled)
                 
@@ -320,16 +316,26 @@ class AudioBridgeWebSocket:
         while self._running:
             try:
                 # Получаем из очереди
-                chunk = await asyncio.wait_for(
-                    self._to_ai_queue.get(),
-                    timeout=0.1
-                )
+                async with asyncio.timeout(0.1):
+                    chunk = await self._to_ai_queue.get()
+                
+                # Забираем уже накопившиеся чанки и отправляем одним вызовом (без ожидания новых)
+                chunks = [chunk]
+                while len(chunks) < self._coalesce_max_chunks and not self._to_ai_queue.empty():
+                    chunks.append(self._to_ai_queue.get_nowait())
+                payload = chunk if len(chunks) == 1 else b"".join(chunks)
                 
-                # Отправляем в WebSocket
-                await self.elevenlabs.send_audio(chunk)
+                # Отправляем в WebSocket (send_audio копирует данные в свой буфер до первого await)
+                try:
+                    await self.elevenlabs.send_audio(payload)
+                finally:
+                    # Слоты FrameSlab снова свободны
+                    for sent in chunks:
+                        if isinstance(sent, memoryview):
+                            self._to_ai_slab.release(sent)
                 
                 self.metrics.packets_to_ai += 1
-                self.metrics.bytes_to_ai += len(chunk)
+                self.metrics.bytes_to_ai += len(payload)
                 
             except asyncio.TimeoutError:
                 continue
@@ -341,8 +347,6 @@ class AudioBridgeWebSocket:
     async def _receive_from_ai(self) -> None:
         """Получение аудио из ElevenLabs WebSocket"""
         logger.info("📥 Started receive_from_ai task")
-        print("[Bridge] 📥 Receiver from AI started")
-        chunks_received = 0
         empty_receives = 0
         
         while self._running:
@@ -350,20 +354,20 @@ class AudioBridgeWebSocket:
                 # Получаем аудио от ElevenLabs
                 chunk = await self.elevenlabs.receive_audio()
                 if chunk:
-                    # Нормализуем к PCM 16kHz, 16-bit
-                    chunk = self._normalize_ai_audio_to_pcm16k(chunk)
-                    chunks_received += 1
-                    if chunks_received == 1:
-                        logger.info(f"🎉 FIRST RESPONSE FROM ELEVENLABS! Size={len(chunk)} bytes")
-                        print(f"[Bridge] 🗣️ First AI audio chunk: {len(chunk)} bytes (16k pcm normalized)")
-                    elif chunks_received % 50 == 0:
-                        logger.info(f"📥 From ElevenLabs: chunk #{chunks_received}")
-                    
-                    # Добавляем в очередь для обработки
-                    await self._from_ai_queue.put(chunk)
-                    if chunks_received == 1:
-                        logger.info(f"✅ Added first chunk to queue, queue size: {self._from_ai_queue.qsize()}")
-                        print(f"[Bridge] 📦 Queue size after adding first chunk: {self._from_ai_queue.qsize()}")
+                    # Нормализуем к PCM 16kHz, 16-bit; pcm_16000 уже готов
+                    if self._normalize_ai is not None:
+                        chunk = self._normalize_ai_audio_to_pcm16k(chunk)
+                    # Добавляем в очередь для обработки: обычно место есть - без корутины put()
+                    try:
+                        self._from_ai_queue.put_nowait(chunk)
+                    except asyncio.QueueFull:
+                        if self._ai_queue_drop_oldest:
+                            # Ограничиваем задержку: вместо ожидания вытесняем самый старый чанк
+                            self._from_ai_queue.get_nowait()
+                            self._from_ai_queue.put_nowait(chunk)
+                            self.metrics.dropped_frames += 1
+                        else:
+                            await self._from_ai_queue.put(chunk)
                 else:
                     empty_receives += 1
                     if empty_receives % 100 == 0:
@@ -388,9 +392,20 @@ class AudioBridgeWebSocket:
     
     async def _monitor_metrics(self) -> None:
         """Мониторинг метрик для отладки"""
+        first_audio_reported: set[str] = set()
         while self._running:
             await asyncio.sleep(10)  # Логируем каждые 10 секунд
             
+            # Первое аудио по каждому направлению - раз, вместо проверок в горячих циклах
+            for direction, packets in (
+                ("from_caller", self.metrics.packets_from_caller),
+                ("from_ai", self.metrics.packets_from_ai),
+                ("to_caller", self.metrics.packets_to_caller),
+            ):
+                if packets and direction not in first_audio_reported:
+                    first_audio_reported.add(direction)
+                    logger.info("🎉 First audio flowing", direction=direction)
+            
             logger.info(
                 "Audio bridge metrics",
                 caller_to_ai={
@@ -402,6 +417,7 @@ class AudioBridgeWebSocket:
                     "bytes": self.metrics.bytes_to_caller
                 },
                 resampling_ops=self.metrics.resampling_operations,
+                dropped_frames=self.metrics.dropped_frames,
                 errors=self.metrics.errors,
                 queues={
                     "to_ai": self._to_ai_queue.qsize(),
@@ -4,17 +4,95 @@
 
 import asyncio
 import os
+from functools import lru_cache
 from abc import ABC, abstractmethod
-from typing import Optional, AsyncIterator
-from dataclasses import dataclass
+from typing import Optional, AsyncIterator, Union
+from collections import deque
+from dataclasses import dataclass, field
 import struct
 import numpy as np
 from enum import Enum
 
+from scipy.signal import firwin, upfirdn
 import structlog
 
+from src.infrastructure.audio.ulaw import decode_ulaw, encode_ulaw
+
 logger = structlog.get_logger()
 
+# Тот же FIR, что resample_poly строит сам для коэффициентов 2/1 и 1/2
+# (kaiser, beta=5, половина длины 10 * max_rate) - считаем его один раз
+RESAMPLE_2X_FILTER = firwin(2 * 10 * 2 + 1, 1.0 / 2, window=("kaiser", 5.0))
+
+# Сколько входных сэмплов прошлого чанка нужно фильтру, чтобы посчитать новый без нулевого
+# дополнения на стыке: 8k -> 16k - половина длины фильтра, 16k -> 8k - вся длина
+RESAMPLE_2X_HISTORY = {
+    True: (len(RESAMPLE_2X_FILTER) - 1) // 2,
+    False: len(RESAMPLE_2X_FILTER) - 1,
+}
+
+# Чанки до этой длины (в сэмплах) ресэмплируются готовой матрицей; длинные - upfirdn
+RESAMPLE_MATRIX_MAX_INPUT = 640
+
+# Сколько кадров из очереди записи уходит в FIFO одним os.writev
+WRITEV_MAX_FRAMES = 4
+
+# Сколько непрочитанных кадров держит приёмный буфер канала; старые сверх лимита отбрасываются
+RX_BUFFER_MAX_FRAMES = 50
+
+
+def _resample_2x_stream(extended: np.ndarray, up: bool, axis: int = -1) -> np.ndarray:
+    """
+    Потоковый ресэмплинг 2:1: extended - история прошлых чанков и сам чанк.
+    Возвращает только отсчёты нового чанка, для которых фильтру хватает входа;
+    весь поток сдвинут на постоянную задержку фильтра (20 сэмплов 16kHz, 1.25мс).
+    """
+    history = RESAMPLE_2X_HISTORY[up]
+    length = extended.shape[axis]
+    if up:
+        filtered = upfirdn(RESAMPLE_2X_FILTER * 2, extended, up=2, axis=axis)
+        rows = slice(2 * history, 2 * length)
+    else:
+        filtered = upfirdn(RESAMPLE_2X_FILTER, extended, down=2, axis=axis)
+        rows = slice(history // 2, length // 2)
+    return filtered[(slice(None),) * (axis % filtered.ndim) + (rows,)]
+
+
+@lru_cache(maxsize=8)
+def _resample_2x_matrix(input_length: int, up: bool) -> np.ndarray:
+    """
+    Потоковый фильтр линеен, поэтому для фиксированной длины чанка он сводится
+    к одной матрице по [история | чанк]: столбец i - отклик на единичный импульс в сэмпле i.
+    Дальше каждый чанк - одно умножение матрицы на вектор (BLAS).
+    """
+    extended_length = RESAMPLE_2X_HISTORY[up] + input_length
+    matrix = _resample_2x_stream(np.eye(extended_length), up, axis=0)
+    matrix = matrix.astype(np.float32)
+    matrix.flags.writeable = False  # общий кэш для всех потоков
+    return matrix
+
+
+def resample_linear(audio: np.ndarray, new_length: int) -> np.ndarray:
+    """
+    Линейная интерполяция на равномерную сетку (как np.interp по np.linspace),
+    но индексы соседних сэмплов вычисляются напрямую, без поиска и лишних массивов.
+    """
+    last = len(audio) - 1
+    if new_length < 2 or last < 1:
+        fill = audio[0] if len(audio) else 0
+        return np.full(new_length, fill, dtype=np.int16)
+    
+    positions = np.arange(new_length, dtype=np.float64)
+    positions *= last / (new_length - 1)
+    left = positions.astype(np.intp)
+    np.minimum(left, last - 1, out=left)
+    
+    base = audio[left].astype(np.float64)
+    positions -= left  # дробная часть
+    positions *= audio[left + 1] - base
+    positions += base
+    return positions.astype(np.int16)
+
 
 class AudioFormat(Enum):
     """Поддерживаемые форматы аудио"""
@@ -29,30 +107,23 @@ class AudioConfig:
     format: AudioFormat
     chunk_duration_ms: int = 20  # Стандартная длительность чанка для VoIP
     
-    @property
-    def sample_rate(self) -> int:
-        if self.format == AudioFormat.PCM_16BIT_8KHZ_MONO:
-            return 8000
-        elif self.format == AudioFormat.PCM_16BIT_16KHZ_MONO:
-            return 16000
-        elif self.format == AudioFormat.ULAW_8KHZ_MONO:
-            return 8000
-        return 8000
-    
-    @property
-    def chunk_size_bytes(self) -> int:
-        """Размер чанка в байтах"""
-        samples_per_chunk = int(self.sample_rate * self.chunk_duration_ms / 1000)
+    # Производные значения читаются на каждом чанке - считаем их один раз
+    sample_rate: int = field(init=False)
+    chunk_size_samples: int = field(init=False)  # Количество сэмплов в чанке
+    chunk_size_bytes: int = field(init=False)  # Размер чанка в байтах
+    
+    def __post_init__(self) -> None:
+        if self.format == AudioFormat.PCM_16BIT_16KHZ_MONO:
+            self.sample_rate = 16000
+        else:
+            self.sample_rate = 8000
+        
+        self.chunk_size_samples = int(self.sample_rate * self.chunk_duration_ms / 1000)
         # PCM 16-bit formats use 2 bytes per sample; μ-law uses 1 byte per sample
         if self.format in (AudioFormat.PCM_16BIT_8KHZ_MONO, AudioFormat.PCM_16BIT_16KHZ_MONO):
-            return samples_per_chunk * 2
+            self.chunk_size_bytes = self.chunk_size_samples * 2
         else:
-            return samples_per_chunk
-    
-    @property
-    def chunk_size_samples(self) -> int:
-        """Количество сэмплов в чанке"""
-        return int(self.sample_rate * self.chunk_duration_ms / 1000)
+            self.chunk_size_bytes = self.chunk_size_samples
 
 
 class AudioTransport(ABC):
@@ -74,7 +145,7 @@ class AudioTransport(ABC):
     
     @abstractmethod
     async def read_chunk(self) -> Optional[bytes]:
-        """Чтение аудио чанка"""
+        """Чтение аудио чанка; None, если данных нет за короткий таймаут"""
         pass
     
     @abstractmethod
@@ -105,20 +176,47 @@ class NamedPipeTransport(AudioTransport):
         self._output_fd: Optional[int] = None
         self._read_task: Optional[asyncio.Task] = None
         self._write_queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        # Единственный потребитель _write_queue - порядок кадров сохраняется
+        self._write_task: Optional[asyncio.Task] = None
+        self._writev_calls = 0
+        self._frames_written = 0
+        
+        # Данные из входного канала, накопленные callback'ом add_reader
+        self._rx_buffer = bytearray()
+        self._rx_ready = asyncio.Event()
+        # os.readv читает прямо в этот буфер, без нового bytes на каждое чтение
+        self._read_view = memoryview(bytearray(4096))
+        # Чтения, не кратные размеру чанка (Baresip обычно пишет кадр целиком)
+        self._partial_reads = 0
+        # Кадры, вытесненные из переполненного приёмного буфера, пока читатель стоит
+        self._rx_dropped_frames = 0
+        self._read_timeout = 0.1  # секунд
     
     async def start(self) -> None:
         """Создаём и открываем именованные каналы"""
         # Создаём FIFO если не существуют
         for pipe in [self.input_pipe, self.output_pipe]:
-            if not os.path.exists(pipe):
+            try:
                 os.mkfifo(pipe)
                 await logger.ainfo(f"Created FIFO pipe: {pipe}")
+            except FileExistsError:
+                pass
         
         # Открываем в неблокирующем режиме
-        # На macOS используем O_RDWR вместо O_WRONLY для избежания ошибки "Device not configured"
-        self._input_fd = os.open(self.input_pipe, os.O_RDONLY | os.O_NONBLOCK)
+        # На macOS используем O_RDWR вместо O_WRONLY для избежания ошибки "Device not configured".
+        # Входной канал тоже O_RDWR: у FIFO всегда есть писатель, и без Baresip
+        # add_reader не будит цикл событий бесконечным EOF
+        self._input_fd = os.open(self.input_pipe, os.O_RDWR | os.O_NONBLOCK)
         self._output_fd = os.open(self.output_pipe, os.O_RDWR | os.O_NONBLOCK)
         
+        self._rx_buffer.clear()
+        self._rx_ready.clear()
+        asyncio.get_running_loop().add_reader(self._input_fd, self._on_readable)
+        
+        while not self._write_queue.empty():
+            self._write_queue.get_nowait()
+        self._write_task = asyncio.create_task(self._writer_loop())
+        
         self._running = True
         await logger.ainfo(
             "Named pipe transport started",
@@ -133,7 +231,16 @@ class NamedPipeTransport(AudioTransport):
         """Закрываем каналы"""
         self._running = False
         
+        if self._write_task:
+            self._write_task.cancel()
+            try:
+                await self._write_task
+            except asyncio.CancelledError:
+                pass
+            self._write_task = None
+        
         if self._input_fd:
+            asyncio.get_running_loop().remove_reader(self._input_fd)
             os.close(self._input_fd)
             self._input_fd = None
         
@@ -141,34 +248,63 @@ class NamedPipeTransport(AudioTransport):
             os.close(self._output_fd)
             self._output_fd = None
         
-        await logger.ainfo("Named pipe transport stopped")
+        await logger.ainfo(
+            "Named pipe transport stopped",
+            partial_reads=self._partial_reads,
+            rx_dropped_frames=self._rx_dropped_frames,
+            writev_calls=self._writev_calls,
+            frames_written=self._frames_written,
+        )
+    
+    def _on_readable(self) -> None:
+        """Вызывается циклом событий, когда во входном канале есть данные"""
+        try:
+            n = os.readv(self._input_fd, [self._read_view])
+        except BlockingIOError:
+            return
+        if n % self.config.chunk_size_bytes:
+            self._partial_reads += 1
+        self._rx_buffer += self._read_view[:n]
+        chunk_size = self.config.chunk_size_bytes
+        # Читатель стоит (например, очередь к AI полна до подключения WebSocket) - держим
+        # только последние кадры: старые целыми кадрами, чтобы не сбить границы
+        overflow = len(self._rx_buffer) // chunk_size - RX_BUFFER_MAX_FRAMES
+        if overflow > 0:
+            del self._rx_buffer[:overflow * chunk_size]
+            self._rx_dropped_frames += overflow
+        if len(self._rx_buffer) >= chunk_size:
+            self._rx_ready.set()
     
     async def read_chunk(self) -> Optional[bytes]:
-        """Читаем чанк из входного канала"""
+        """Читаем чанк из входного канала, ожидая готовности fd, а не опрашивая его"""
         if not self._input_fd:
             return None
         
-        try:
-            # Пытаемся прочитать нужное количество байт
-            data = os.read(self._input_fd, self.config.chunk_size_bytes)
-            if len(data) == self.config.chunk_size_bytes:
-                return data
-            # Если прочитали меньше, накапливаем
-            buffer = bytearray(data)
-            while len(buffer) < self.config.chunk_size_bytes:
-                await asyncio.sleep(0.001)
-                try:
-                    chunk = os.read(self._input_fd, 
-                                  self.config.chunk_size_bytes - len(buffer))
-                    buffer.extend(chunk)
-                except BlockingIOError:
-                    continue
-            return bytes(buffer)
-        except BlockingIOError:
-            return None
+        chunk_size = self.config.chunk_size_bytes
+        if len(self._rx_buffer) < chunk_size:
+            try:
+                async with asyncio.timeout(self._read_timeout):
+                    await self._rx_ready.wait()
+            except asyncio.TimeoutError:
+                return None
+        
+        # Обычный случай: в буфере ровно один кадр - забираем целиком, без сдвига остатка
+        if len(self._rx_buffer) == chunk_size:
+            chunk = bytes(self._rx_buffer)
+            self._rx_buffer.clear()
+            self._rx_ready.clear()
+            return chunk
+        
+        # Одна копия через memoryview (срез bytearray дал бы вторую); view освобождаем до del
+        with memoryview(self._rx_buffer) as view, view[:chunk_size] as head:
+            chunk = bytes(head)
+        del self._rx_buffer[:chunk_size]
+        if len(self._rx_buffer) < chunk_size:
+            self._rx_ready.clear()
+        return chunk
     
     async def write_chunk(self, data: bytes) -> None:
-        """Пишем чанк в выходной канал"""
+        """Ставим чанк в очередь записи в выходной канал"""
         if not self._output_fd or not data:
             return
         
@@ -181,48 +317,186 @@ class NamedPipeTransport(AudioTransport):
             else:
                 data = data[:self.config.chunk_size_bytes]
         
-        written = 0
-        while written < len(data):
+        # Пишет _writer_loop; если Baresip не успевает, put ждёт место в очереди
+        await self._write_queue.put(data)
+    
+    async def _writer_loop(self) -> None:
+        """Забирает накопленные кадры из очереди и пишет их в канал пачкой"""
+        while True:
+            frames = [await self._write_queue.get()]
+            while len(frames) < WRITEV_MAX_FRAMES and not self._write_queue.empty():
+                frames.append(self._write_queue.get_nowait())
             try:
-                n = os.write(self._output_fd, data[written:])
-                written += n
+                await self._write_frames(frames)
+            except OSError as e:
+                await logger.aerror("Pipe write failed", error=str(e), frames=len(frames))
+    
+    async def _write_frames(self, frames: list) -> None:
+        """Пишет кадры одним os.writev, дописывая остаток при частичной записи"""
+        self._frames_written += len(frames)
+        remaining = sum(len(frame) for frame in frames)
+        while remaining:
+            try:
+                n = os.writev(self._output_fd, frames)
             except BlockingIOError:
-                await asyncio.sleep(0.001)
+                # Канал переполнен - ждём, пока Baresip его вычитает
+                await self._wait_writable()
+                continue
+            self._writev_calls += 1
+            remaining -= n
+            if remaining:
+                # Частичная запись бывает только при почти полном канале - склейка тут не страшна
+                frames = [memoryview(b"".join(frames))[n:]]
+    
+    async def _wait_writable(self) -> None:
+        """Ожидает готовности выходного канала к записи через add_writer"""
+        loop = asyncio.get_running_loop()
+        writable = loop.create_future()
+        loop.add_writer(self._output_fd, lambda: writable.done() or writable.set_result(None))
+        try:
+            await writable
+        finally:
+            loop.remove_writer(self._output_fd)
 
 
 class AudioResampler:
-    """Ресэмплер для преобразования между форматами"""
+    """
+    Ресэмплер для преобразования между форматами.
     
-    @staticmethod
-    def resample_pcm(data: bytes, from_rate: int, to_rate: int) -> bytes:
-        """Простой ресэмплинг PCM 16-bit"""
+    Держит переиспользуемые int16 буферы результата и историю фильтра 2:1
+    по каждому направлению, поэтому экземпляр ведёт один поток на направление
+    и не должен делиться между потоками.
+    """
+    
+    def __init__(self) -> None:
+        # Длина результата -> буфер int16 (на каждый размер чанка свой)
+        self._out_buffers: dict[int, np.ndarray] = {}
+        # (длина входа, up) -> float32 буферы [история | чанк] и результата для матричного пути
+        self._matrix_buffers: dict[tuple[int, bool], tuple[np.ndarray, np.ndarray]] = {}
+        # up -> хвост предыдущего входа: фильтр продолжает поток, а не начинает каждый чанк с нулей
+        self._history: dict[bool, np.ndarray] = {
+            up: np.zeros(size, dtype=np.float32) for up, size in RESAMPLE_2X_HISTORY.items()
+        }
+        # 16k -> 8k берёт сэмплы парами; непарный последний сэмпл ждёт следующего чанка
+        self._pending_down: Optional[np.ndarray] = None
+    
+    def resample_pcm(
+        self,
+        data: bytes,
+        from_rate: int,
+        to_rate: int,
+        out: Optional[memoryview] = None
+    ) -> Union[bytes, memoryview]:
+        """
+        Простой ресэмплинг PCM 16-bit.
+        
+        Если передан out подходящего размера (слот FrameSlab), результат 2:1
+        пишется прямо в него и возвращается out - без нового bytes.
+        """
         if from_rate == to_rate:
             return data
         
-        # Конвертируем в numpy array
-        samples = np.frombuffer(data, dtype=np.int16)
+        # Конвертируем в numpy array (без копии)
+        return self.resample_samples(np.frombuffer(data, dtype=np.int16), from_rate, to_rate, out)
+    
+    def resample_samples(
+        self,
+        samples: np.ndarray,
+        from_rate: int,
+        to_rate: int,
+        out: Optional[memoryview] = None
+    ) -> Union[bytes, memoryview]:
+        """Ресэмплинг уже декодированных int16 сэмплов (без промежуточных bytes)"""
+        if from_rate == to_rate:
+            return samples.tobytes()
+        
+        # Телефония <-> ElevenLabs всегда 2:1 - полифазный FIR вместо интерполяции
+        if (from_rate, to_rate) in ((8000, 16000), (16000, 8000)):
+            return self._resample_2x(samples, up=from_rate < to_rate, out=out)
         
         # Простая линейная интерполяция
         ratio = to_rate / from_rate
         new_length = int(len(samples) * ratio)
         
-        # Индексы для интерполяции
-        old_indices = np.arange(len(samples))
-        new_indices = np.linspace(0, len(samples) - 1, new_length)
+        return resample_linear(samples, new_length).tobytes()
+    
+    def _resample_2x(
+        self,
+        samples: np.ndarray,
+        up: bool,
+        out: Optional[memoryview] = None
+    ) -> Union[bytes, memoryview]:
+        """Ресэмплинг 8k <-> 16k предрассчитанным anti-alias фильтром с историей между чанками"""
+        if not up:
+            if self._pending_down is not None:
+                samples = np.concatenate((self._pending_down, samples))
+                self._pending_down = None
+            if len(samples) % 2:
+                self._pending_down = samples[-1:].copy()
+                samples = samples[:-1]
         
-        # Интерполяция
-        resampled = np.interp(new_indices, old_indices, samples)
+        history = self._history[up]
+        if len(samples) <= RESAMPLE_MATRIX_MAX_INPUT:
+            # 20мс кадры телефонии: размер постоянный, матрица строится один раз
+            matrix = _resample_2x_matrix(len(samples), up)
+            buffers = self._matrix_buffers.get((len(samples), up))
+            if buffers is None:
+                buffers = self._matrix_buffers[(len(samples), up)] = (
+                    np.empty(len(history) + len(samples), dtype=np.float32),
+                    np.empty(matrix.shape[0], dtype=np.float32),
+                )
+            src, resampled = buffers
+            # float32 sgemv без временных массивов: [история | int16 -> float32] и результат в готовые буферы
+            src[:len(history)] = history
+            np.copyto(src[len(history):], samples)
+            np.matmul(matrix, src, out=resampled)
+            history[:] = src[len(src) - len(history):]
+        else:
+            src = np.concatenate((history, samples.astype(np.float32)))
+            resampled = _resample_2x_stream(src, up)
+            history[:] = src[len(src) - len(history):]
         
-        return resampled.astype(np.int16).tobytes()
+        if out is not None and out.nbytes == resampled.size * 2:
+            target = np.frombuffer(out, dtype=np.int16)
+        else:
+            out = None
+            target = self._out_buffers.get(len(resampled))
+            if target is None:
+                target = self._out_buffers[len(resampled)] = np.empty(len(resampled), dtype=np.int16)
+        # Обрезка до int16 и приведение типа одним проходом в готовый буфер
+        np.clip(resampled, -32768, 32767, out=target, casting="unsafe")
+        return out if out is not None else target.tobytes()
     
     @staticmethod
     def ulaw_to_pcm(data: bytes) -> bytes:
         """Конвертация μ-law в PCM 16-bit"""
-        import g711
-        return g711.decode_ulaw(data)
+        return decode_ulaw(data).tobytes()
     
     @staticmethod
     def pcm_to_ulaw(data: bytes) -> bytes:
         """Конвертация PCM 16-bit в μ-law"""
-        import g711
-        return g711.encode_ulaw(data)
+        return encode_ulaw(data)
+
+
+class FrameSlab:
+    """
+    Набор слотов фиксированного размера в одном bytearray.
+    
+    Очередь передаёт memoryview слота вместо нового bytes на каждый кадр;
+    потребитель возвращает слот через release(), когда данные скопированы.
+    """
+    
+    def __init__(self, frame_bytes: int, slots: int) -> None:
+        self.frame_bytes = frame_bytes
+        self._buffer = bytearray(frame_bytes * slots)
+        view = memoryview(self._buffer)
+        self._free: deque[memoryview] = deque(
+            view[i * frame_bytes:(i + 1) * frame_bytes] for i in range(slots)
+        )
+    
+    def acquire(self) -> Optional[memoryview]:
+        """Свободный слот или None, если все заняты"""
+        return self._free.popleft() if self._free else None
+    
+    def release(self, frame: memoryview) -> None:
+        self._free.append(frame)
@@ -0,0 +1,114 @@
+"""
+Сигналы подключения/отключения ElevenLabs WebSocket между API и аудио мостом.
+
+API и run_audio_bridge.py работают в разных процессах, поэтому сигналы
+передаются через именованные каналы (FIFO). Мост держит их открытыми и
+просыпается только при записи в канал — без периодического опроса файлов.
+"""
+
+import asyncio
+import errno
+import os
+import stat
+from typing import Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+CONNECT_SIGNAL_PIPE = "/tmp/connect_websocket"
+DISCONNECT_SIGNAL_PIPE = "/tmp/disconnect_websocket"
+
+
+# Открытые пишущие концы каналов: fd держим между сигналами, а не открываем на каждый
+_writer_fds: dict[str, int] = {}
+
+
+def _open_writer(pipe_path: str) -> Optional[int]:
+    try:
+        # O_NONBLOCK: без читателя open() сразу падает с ENXIO, а не блокирует API
+        fd = os.open(pipe_path, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as e:
+        if e.errno in (errno.ENOENT, errno.ENXIO):
+            return None
+        raise
+    _writer_fds[pipe_path] = fd
+    return fd
+
+
+def _close_writer(pipe_path: str) -> None:
+    fd = _writer_fds.pop(pipe_path, None)
+    if fd is not None:
+        os.close(fd)
+
+
+def send_bridge_signal(pipe_path: str, payload: str = "") -> bool:
+    """
+    Отправляет сигнал аудио мосту.
+
+    Returns:
+        False, если мост не запущен (канала нет или его никто не читает)
+        или не вычитывает канал (FIFO переполнен)
+    """
+    data = f"{payload}\n".encode("utf-8")
+    fd = _writer_fds.get(pipe_path)
+    if fd is not None:
+        try:
+            os.write(fd, data)
+            return True
+        except BlockingIOError:
+            # Читатель есть, но канал полон - fd оставляем, сигнал не доставлен
+            return False
+        except BrokenPipeError:
+            # Мост перезапускался без читателя - открываем канал заново
+            _close_writer(pipe_path)
+
+    fd = _open_writer(pipe_path)
+    if fd is None:
+        return False
+    try:
+        os.write(fd, data)
+    except BlockingIOError:
+        return False
+    except OSError:
+        _close_writer(pipe_path)
+        raise
+    return True
+
+
+class BridgeSignalPipe:
+    """Читающая сторона сигнального канала: устанавливает asyncio.Event при записи"""
+
+    def __init__(self, pipe_path: str, event: asyncio.Event):
+        self.pipe_path = pipe_path
+        self.event = event
+        self._fd: Optional[int] = None
+
+    def open(self) -> None:
+        """Создаёт FIFO (заменяя устаревший сигнальный файл) и подписывается на чтение"""
+        try:
+            if not stat.S_ISFIFO(os.stat(self.pipe_path).st_mode):
+                os.remove(self.pipe_path)
+                os.mkfifo(self.pipe_path)
+        except FileNotFoundError:
+            os.mkfifo(self.pipe_path)
+
+        # O_RDWR: канал всегда имеет писателя, поэтому EOF не будит цикл событий
+        self._fd = os.open(self.pipe_path, os.O_RDWR | os.O_NONBLOCK)
+        asyncio.get_running_loop().add_reader(self._fd, self._on_readable)
+        logger.info("Listening for bridge signals", pipe=self.pipe_path)
+
+    def close(self) -> None:
+        if self._fd is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._fd)
+        os.close(self._fd)
+        self._fd = None
+
+    def _on_readable(self) -> None:
+        try:
+            os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+        self.event.set()
@@ -0,0 +1,51 @@
+"""
+G.711 μ-law <-> 16-bit PCM через таблицы.
+
+μ-law байт имеет всего 256 значений, а int16 сэмпл - 65536, поэтому обе
+стороны преобразования считаются один раз при импорте и дальше сводятся
+к одной выборке NumPy по таблице.
+"""
+
+import numpy as np
+
+
+ULAW_BIAS = 0x84
+ULAW_CLIP = 32635
+
+
+def _ulaw_to_linear(code: int) -> int:
+    """G.711 μ-law → 16-bit linear PCM для одного байта"""
+    code = ~code & 0xFF
+    exponent = (code >> 4) & 0x07
+    mantissa = code & 0x0F
+    sample = (((mantissa << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return -sample if code & 0x80 else sample
+
+
+def _linear_to_ulaw(sample: int) -> int:
+    """16-bit linear PCM → G.711 μ-law для одного сэмпла"""
+    sign = 0x80 if sample < 0 else 0
+    magnitude = min(abs(sample), ULAW_CLIP) + ULAW_BIAS
+    exponent = max((magnitude >> 7).bit_length() - 1, 0)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+# Индекс - μ-law байт
+ULAW_TO_PCM = np.array([_ulaw_to_linear(code) for code in range(256)], dtype=np.int16)
+
+# Индекс - int16 сэмпл, прочитанный как uint16
+PCM_TO_ULAW = np.array(
+    [_linear_to_ulaw(int(sample)) for sample in np.arange(65536, dtype=np.uint16).view(np.int16)],
+    dtype=np.uint8,
+)
+
+
+def decode_ulaw(data: bytes) -> np.ndarray:
+    """μ-law байты → PCM int16"""
+    return ULAW_TO_PCM[np.frombuffer(data, dtype=np.uint8)]
+
+
+def encode_ulaw(data: bytes) -> bytes:
+    """PCM 16-bit байты → μ-law байты"""
+    return PCM_TO_ULAW[np.frombuffer(data, dtype=np.int16).view(np.uint16)].tobytes()
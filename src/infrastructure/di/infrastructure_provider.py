@@ -36,6 +36,8 @@ class InfrastructureProvider(Provider):
         config = ElevenLabsConfig(
             api_key=settings.elevenlabs_api_key,
             agent_id=settings.elevenlabs_agent_id,
-            ws_url=settings.elevenlabs_ws_url
+            ws_url=settings.elevenlabs_ws_url,
+            optimize_streaming_latency=settings.elevenlabs_optimize_streaming_latency,
+            debug=settings.elevenlabs_debug
         )
         return ElevenLabsClient(config)
\ No newline at end of file
@@ -4,11 +4,14 @@ from src.infrastructure.ai.elevenlabs_client import ElevenLabsClient
 from src.infrastructure.audio.audio_bridge import AudioBridge
 from src.infrastructure.telephony.baresip_controller import BaresipController
 from src.repositories.call_repository import CallRepository
+from src.services.call_monitor import CallMonitor
 from src.services.call_service import CallService
 
 
 class ServiceProvider(Provider):
-    scope = Scope.REQUEST
+    # Один CallService на приложение: активный звонок, его задачи и подписчики
+    # событий должны быть общими для всех запросов и для CallMonitor
+    scope = Scope.APP
     
     @provide
     def provide_call_service(
@@ -23,4 +26,15 @@ class ServiceProvider(Provider):
             audio_bridge=audio_bridge,
             elevenlabs_client=elevenlabs_client,
             call_repository=call_repository
-        )
\ No newline at end of file
+        )
+    
+    @provide
+    def provide_call_monitor(
+        self,
+        baresip_controller: BaresipController,
+        call_service: CallService
+    ) -> CallMonitor:
+        return CallMonitor(
+            baresip=baresip_controller,
+            call_service=call_service
+        )
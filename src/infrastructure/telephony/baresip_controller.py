@@ -1,10 +1,13 @@
 import asyncio
-import json
+import itertools
 import logging
+import socket
+from contextlib import suppress
 from typing import Optional, Any, List
 from dataclasses import dataclass
 from enum import Enum
 
+import orjson
 import structlog
 
 from src.core.config import BaresipConfig
@@ -26,6 +29,30 @@ class BaresipCommand(str, Enum):
     REG_INFO = "reginfo"
 
 
+# JSON команды без параметров без закрывающей скобки: {"command":"hangup"
+_COMMAND_PREFIXES: dict[BaresipCommand, bytes] = {}
+
+# JSON команды dial: params подставляется уже сериализованной строкой (с кавычками и экранированием)
+_DIAL_TEMPLATE = b'{"command":"dial","params":%b,"token":"%b"}'
+
+
+# События, после которых мониторинг звонка завершается
+_CALL_END_EVENTS = frozenset({"CALL_CLOSED", "CALL_FAILED"})
+
+# Приоритет события для BaresipResponse.data; 0 - событие не выбирается
+_EVENT_PRIORITY = {
+    "CALL_CLOSED": 3,
+    "CALL_FAILED": 3,
+    "CALL_ESTABLISHED": 2,
+    "CALL_ANSWERED": 2,
+    "CALL_OUTGOING": 1,
+}
+
+
+def _event_priority(event: dict[str, Any]) -> int:
+    return _EVENT_PRIORITY.get(event.get("type"), 0)
+
+
 @dataclass
 class BaresipResponse:
     success: bool
@@ -34,26 +61,68 @@ class BaresipResponse:
     events: Optional[List[dict[str, Any]]] = None  # Все события из ответа
 
 
+async def read_netstring(reader: asyncio.StreamReader) -> memoryview:
+    """
+    Читает одно netstring-сообщение ctrl_tcp ("<len>:<json>,").
+    Длина известна из заголовка, поэтому тело читается ровно целиком.
+    Тело отдаётся срезом memoryview без копии - orjson.loads принимает его напрямую.
+    """
+    header = await reader.readuntil(b":")
+    payload = await reader.readexactly(int(header[:-1]) + 1)
+    return memoryview(payload)[:-1]  # без завершающей ','
+
+
+# Сообщения для событий, важных при разборе звонка; остальные логируются общим
+_EVENT_LOG_MESSAGES = {
+    "CALL_ESTABLISHED": "🎉 CALL_ESTABLISHED - SIP 200 OK, real person answered, connect WebSocket",
+    "CALL_PROGRESS": "📢 CALL_PROGRESS - SIP 183, operator/voicemail message, no WebSocket",
+    "CALL_RINGING": "🔔 CALL_RINGING - Phone is ringing",
+    "CALL_OUTGOING": "📞 CALL_OUTGOING - Initiating call",
+    "CALL_CLOSED": "📵 Call ended, disconnect WebSocket if established",
+    "CALL_FAILED": "📵 Call ended, disconnect WebSocket if established",
+}
+
+
 class BaresipController:
     def __init__(self, config: BaresipConfig) -> None:
         self.config = config
-        self.host = config.host  # ВАЖНО: сохраняем host для monitor_call_events
+        self.host = config.host
         self.port = config.ctrl_tcp_port  # ВАЖНО: используем правильное имя поля!
         self.reader: Optional[asyncio.StreamReader] = None
         self.writer: Optional[asyncio.StreamWriter] = None
         self._connected = False
-        self._lock = asyncio.Lock()
+        self._connect_lock = asyncio.Lock()
+        # Команды не ждут друг друга: ответ находит свою команду по token.
+        # token -> (future, сообщения: события за время ожидания + сам ответ)
+        self._pending: dict[str, tuple[asyncio.Future, list[dict[str, Any]]]] = {}
+        self._tokens = itertools.count(1)
+        self._reader_task: Optional[asyncio.Task] = None
+        # ua_index -> формат params, с которым dial сработал в прошлый раз
+        self._dial_format_cache: dict[int, str] = {}
+        # Очереди подписчиков monitor_call_events; None в очереди - соединение потеряно
+        self._event_subscribers: set[asyncio.Queue] = set()
         
     async def connect(self) -> None:
-        if self._connected:
-            return
-            
+        async with self._connect_lock:
+            if self._connected:
+                return
+            await self._open_connection()
+    
+    async def _open_connection(self) -> None:
         try:
             self.reader, self.writer = await asyncio.open_connection(
                 self.config.host, 
                 self.config.ctrl_tcp_port
             )
+            # Короткие netstring-команды не должны ждать склейки Nagle. asyncio и uvloop
+            # обычно включают TCP_NODELAY сами - выставляем явно, не полагаясь на цикл событий
+            sock = self.writer.get_extra_info("socket")
+            if sock is not None:
+                with suppress(OSError):
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            
             self._connected = True
+            self._reader_task = asyncio.create_task(self._read_loop(), name="baresip_ctrl_reader")
             await logger.ainfo(
                 "Connected to baresip",
                 host=self.config.host,
@@ -71,6 +140,14 @@ class BaresipController:
     async def disconnect(self) -> None:
         if not self._connected:
             return
+        
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
             
         if self.writer:
             self.writer.close()
@@ -79,145 +156,135 @@ class BaresipController:
         self._connected = False
         await logger.ainfo("Disconnected from baresip")
     
+    async def _read_loop(self) -> None:
+        """Единственный читатель ctrl_tcp: раздаёт ответы ожидающим командам"""
+        try:
+            while True:
+                try:
+                    msg = orjson.loads(await read_netstring(self.reader))
+                except orjson.JSONDecodeError:
+                    continue
+                
+                if msg.get('response'):
+                    token = msg.get('token')
+                    if token not in self._pending:
+                        if token is not None or not self._pending:
+                            continue  # ожидающий уже ушёл по таймауту
+                        # Baresip без поддержки token отвечает по порядку команд
+                        token = next(iter(self._pending))
+                    future, messages = self._pending.pop(token)
+                    messages.append(msg)
+                    if not future.done():
+                        future.set_result(messages)
+                elif msg.get('event'):
+                    # Событие достаётся всем командам, которые сейчас ждут ответа, и всем мониторам
+                    for _, messages in self._pending.values():
+                        messages.append(msg)
+                    for queue in self._event_subscribers:
+                        queue.put_nowait(msg)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # EOF или потеря границы сообщения - поток больше не разобрать
+            await logger.aerror("Baresip control connection lost", error=str(e))
+            self.writer.close()
+        finally:
+            self._connected = False
+            for future, _ in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Baresip control connection lost"))
+            self._pending.clear()
+            for queue in self._event_subscribers:
+                queue.put_nowait(None)
+    
     async def send_command(
         self, 
         command: BaresipCommand, 
         params: Optional[str] = None
     ) -> BaresipResponse:
-        async with self._lock:
-            if not self._connected:
-                await self.connect()
+        if not self._connected:
+            await self.connect()
+        
+        try:
+            # Baresip ctrl_tcp expects netstring format with JSON inside
+            token = str(next(self._tokens))
+            if not params:
+                # Most control commands have no params: reuse the serialized prefix, append only the token
+                prefix = _COMMAND_PREFIXES.get(command)
+                if prefix is None:
+                    prefix = _COMMAND_PREFIXES[command] = orjson.dumps({"command": command.value})[:-1]
+                cmd_bytes = prefix + b',"token":"' + token.encode() + b'"}'
+            elif command is BaresipCommand.DIAL:
+                # dial() retries with up to three URI variants - fill the template instead of a dict
+                cmd_bytes = _DIAL_TEMPLATE % (orjson.dumps(params), token.encode())
+            else:
+                cmd_bytes = orjson.dumps({"command": command.value, "params": params, "token": token})
+            
+            # Netstring length counts bytes, not characters
+            netstring = b"%d:%b," % (len(cmd_bytes), cmd_bytes)
             
+            await logger.adebug("Sending netstring command to baresip", netstring=netstring)
+            
+            # Send netstring and wait for the response carrying our token
+            future = asyncio.get_running_loop().create_future()
+            self._pending[token] = (future, [])
             try:
-                # Baresip ctrl_tcp expects netstring format with JSON inside
-                cmd_json = {
-                    "command": command.value,
-                }
-                if params:
-                    cmd_json["params"] = params
-                
-                cmd_str = json.dumps(cmd_json)
-                
-                # Create proper netstring: count bytes, not characters
-                cmd_bytes = cmd_str.encode('utf-8')
-                length = len(cmd_bytes)
-                netstring = f"{length}:".encode('utf-8') + cmd_bytes + b","
-                
-                await logger.adebug("Sending netstring command to baresip", 
-                                   json=cmd_str, 
-                                   netstring=netstring.decode('utf-8', errors='ignore'))
-                
-                # Send netstring
                 self.writer.write(netstring)
                 await self.writer.drain()
+                async with asyncio.timeout(3.0):
+                    messages = await future
+            finally:
+                self._pending.pop(token, None)
+            
+            if messages:
+                await logger.adebug("Received response from baresip", messages=len(messages))
                 
-                # Read response with netstring format
-                response_data = await asyncio.wait_for(
-                    self.reader.read(4096),
-                    timeout=3.0
-                )
+                # Separate events and responses
+                events = [msg for msg in messages if msg.get('event')]
+                responses = [msg for msg in messages if msg.get('response')]
                 
-                if response_data:
-                    response = response_data.decode('utf-8', errors='ignore')
-                    await logger.adebug("Received response from baresip", response=response)
-                    
-                    # Parse multiple netstring messages
-                    messages = []
-                    remaining = response
-                    
-                    while remaining and ':' in remaining:
-                        try:
-                            # Find the length part
-                            colon_idx = remaining.index(':')
-                            length_str = remaining[:colon_idx]
-                            
-                            # Parse length
-                            try:
-                                msg_length = int(length_str)
-                            except ValueError:
-                                break
-                            
-                            # Extract the message
-                            msg_start = colon_idx + 1
-                            msg_end = msg_start + msg_length
-                            
-                            if msg_end > len(remaining):
-                                break
-                                
-                            msg = remaining[msg_start:msg_end]
-                            
-                            # Parse JSON
-                            try:
-                                msg_json = json.loads(msg)
-                                messages.append(msg_json)
-                            except json.JSONDecodeError:
-                                pass
-                            
-                            # Move past the comma
-                            if msg_end < len(remaining) and remaining[msg_end] == ',':
-                                remaining = remaining[msg_end + 1:]
-                            else:
-                                break
-                                
-                        except (ValueError, IndexError):
-                            break
-                    
-                    # Separate events and responses
-                    events = [msg for msg in messages if msg.get('event')]
-                    responses = [msg for msg in messages if msg.get('response')]
-                    
-                    # Find the most important event
+                # Find the most important event: call ended > call connected > call started
+                priority_event = max(events, key=_event_priority, default=None)
+                if priority_event is not None and not _event_priority(priority_event):
                     priority_event = None
-                    for event in events:
-                        event_type = event.get('type')
-                        if event_type in ['CALL_CLOSED', 'CALL_FAILED']:
-                            # Highest priority - call ended
-                            priority_event = event
-                            break
-                        elif event_type in ['CALL_ESTABLISHED', 'CALL_ANSWERED']:
-                            # High priority - call connected
-                            priority_event = event
-                        elif event_type == 'CALL_OUTGOING' and not priority_event:
-                            # Lower priority - call started
-                            priority_event = event
-                    
-                    # If we have a response, check if it's successful
-                    if responses:
-                        resp = responses[0]
-                        if not resp.get('ok'):
-                            return BaresipResponse(
-                                success=False,
-                                error=resp.get('data', 'Command failed'),
-                                events=events
-                            )
-                    
-                    # Return priority event or first event/response
-                    if priority_event:
-                        return BaresipResponse(
-                            success=True,
-                            data=priority_event,
-                            events=events
-                        )
-                    elif messages:
+                
+                # If we have a response, check if it's successful
+                if responses:
+                    resp = responses[0]
+                    if not resp.get('ok'):
                         return BaresipResponse(
-                            success=True,
-                            data=messages[0],
+                            success=False,
+                            error=resp.get('data', 'Command failed'),
                             events=events
                         )
-                    
-                return BaresipResponse(
-                    success=True,
-                    data={"status": "sent"}
-                )
-                    
-            except asyncio.TimeoutError:
-                error_msg = f"Command timeout: {command.value}"
-                await logger.aerror(error_msg)
-                return BaresipResponse(success=False, error=error_msg)
-            except Exception as e:
-                error_msg = f"Command failed: {str(e)}"
-                await logger.aerror(error_msg, command=command.value)
-                return BaresipResponse(success=False, error=error_msg)
+                
+                # Return priority event or first event/response
+                if priority_event:
+                    return BaresipResponse(
+                        success=True,
+                        data=priority_event,
+                        events=events
+                    )
+                elif messages:
+                    return BaresipResponse(
+                        success=True,
+                        data=messages[0],
+                        events=events
+                    )
+                
+            return BaresipResponse(
+                success=True,
+                data={"status": "sent"}
+            )
+                
+        except asyncio.TimeoutError:
+            error_msg = f"Command timeout: {command.value}"
+            await logger.aerror(error_msg)
+            return BaresipResponse(success=False, error=error_msg)
+        except Exception as e:
+            error_msg = f"Command failed: {str(e)}"
+            await logger.aerror(error_msg, command=command.value)
+            return BaresipResponse(success=False, error=error_msg)
     
     async def dial(self, number: str, ua_index: int = 0) -> BaresipResponse:
         # Remove + from number if present
@@ -226,25 +293,32 @@ class BaresipController:
         # Try different formats based on Baresip version
         # Some versions need: "/ua dial <sip:number@domain>"
         # Others need: "/dial <number>" or "/dial sip:number@domain"
-        
-        # Format 1: Full SIP URI (most common)
         sip_uri = f"sip:{clean_number}@{self.config.sip_domain}"
+        params_by_format = {
+            "sip_uri": sip_uri,  # Full SIP URI (most common)
+            "number": clean_number,
+            "ua_index": f"{ua_index} {sip_uri}",
+        }
         
-        await logger.ainfo(f"Attempting to dial: {sip_uri}")
-        
-        # First try with SIP URI
-        response = await self.send_command(BaresipCommand.DIAL, sip_uri)
+        # The format that worked last time for this UA goes first - no dead attempts on every call
+        formats = list(params_by_format)
+        cached = self._dial_format_cache.get(ua_index)
+        if cached:
+            formats.remove(cached)
+            formats.insert(0, cached)
         
-        if not response.success and "could not find UA" in response.error:
-            # If it fails with "could not find UA", try with just the number
-            await logger.ainfo(f"SIP URI failed, trying with just number: {clean_number}")
-            response = await self.send_command(BaresipCommand.DIAL, clean_number)
+        for attempt, dial_format in enumerate(formats):
+            params = params_by_format[dial_format]
+            await logger.ainfo(f"Attempting to dial: {params}", format=dial_format)
+            response = await self.send_command(BaresipCommand.DIAL, params)
+            
+            if response.success:
+                self._dial_format_cache[ua_index] = dial_format
+                return response
             
-            if not response.success:
-                # Last resort: try with UA index prefix
-                dial_with_ua = f"{ua_index} {sip_uri}"
-                await logger.ainfo(f"Plain number failed, trying with UA index: {dial_with_ua}")
-                response = await self.send_command(BaresipCommand.DIAL, dial_with_ua)
+            # Only "could not find UA" means a wrong format; other errors won't be fixed by another one
+            if attempt == 0 and "could not find UA" not in (response.error or ""):
+                return response
         
         return response
     
@@ -268,129 +342,73 @@ class BaresipController:
     async def get_registration_info(self) -> BaresipResponse:
         return await self.send_command(BaresipCommand.REG_INFO)
     
-    async def monitor_call_events(self, timeout: float = 60.0, callback=None) -> List[dict[str, Any]]:
+    async def monitor_call_events(self, timeout: Optional[float] = 60.0, callback=None) -> List[dict[str, Any]]:
         """
         Мониторит события звонка в реальном времени.
-        Использует отдельное соединение для мониторинга.
+        События приходят от общего читателя ctrl_tcp, второе соединение не нужно.
         
         Args:
-            timeout: Максимальное время мониторинга в секундах
+            timeout: Максимальное время мониторинга в секундах; None - без ограничения
+                (дедлайн держит вызывающий)
             callback: Опциональная функция для немедленной обработки событий
         """
         await logger.ainfo(f"🔍 Starting real-time call event monitoring (timeout: {timeout}s)")
         
-        # Создаём отдельное соединение для мониторинга
         try:
-            monitor_reader, monitor_writer = await asyncio.open_connection(
-                self.host, self.port
-            )
-            await logger.ainfo("✅ Created separate connection for event monitoring")
+            await self.connect()
         except Exception as e:
-            await logger.aerror(f"Failed to create monitoring connection: {e}")
+            await logger.aerror(f"Failed to connect for event monitoring: {e}")
             return []
         
+        queue: asyncio.Queue = asyncio.Queue()
+        self._event_subscribers.add(queue)
+        
         events = []
-        start_time = asyncio.get_event_loop().time()
         call_established = False
         
         try:
-            while (asyncio.get_event_loop().time() - start_time) < timeout:
-                try:
-                    # Читаем данные с небольшим таймаутом из отдельного соединения
-                    data = await asyncio.wait_for(
-                        monitor_reader.read(4096),
-                        timeout=0.5  # Уменьшили таймаут для более быстрой реакции
-                    )
+            # Один общий дедлайн на весь мониторинг
+            async with asyncio.timeout(timeout):
+                while True:
+                    msg_json = await queue.get()
+                    if msg_json is None:
+                        await logger.awarning("Baresip connection lost during event monitoring")
+                        break
                     
-                    if data:
-                        response = data.decode('utf-8', errors='ignore')
-                        # Парсим netstring события
-                        remaining = response
+                    if msg_json.get('event'):
+                        event_type = msg_json.get('type')
+                        param = msg_json.get('param', '')
+
+                        if event_type == 'CALL_ESTABLISHED':
+                            call_established = True
                         
-                        while remaining and ':' in remaining:
-                            try:
-                                colon_idx = remaining.index(':')
-                                length_str = remaining[:colon_idx]
-                                msg_length = int(length_str)
-                                msg_start = colon_idx + 1
-                                msg_end = msg_start + msg_length
-                                
-                                if msg_end <= len(remaining):
-                                    msg = remaining[msg_start:msg_end]
-                                    msg_json = json.loads(msg)
-                                    
-                                    if msg_json.get('event'):
-                                        event_type = msg_json.get('type')
-                                        param = msg_json.get('param', '')
-                                        
-                                        # Детальное логирование событий
-                                        if event_type == 'CALL_ESTABLISHED':
-                                            await logger.ainfo("=" * 60)
-                                            await logger.ainfo("🎉 CALL_ESTABLISHED - SIP 200 OK!")
-                                            await logger.ainfo(f"   → Call ID/Param: {param}")
-                                            await logger.ainfo("   → Real person answered the phone")
-                                            await logger.ainfo("   → WebSocket should be connected NOW")
-                                            await logger.ainfo("=" * 60)
-                                            call_established = True
-                                            
-                                        elif event_type == 'CALL_PROGRESS':
-                                            await logger.ainfo("=" * 60)
-                                            await logger.ainfo("📢 CALL_PROGRESS - SIP 183 Session Progress")
-                                            await logger.ainfo(f"   → Param: {param}")
-                                            await logger.ainfo("   → This is operator/voicemail message")
-                                            await logger.ainfo("   → WebSocket should NOT be connected")
-                                            await logger.ainfo("=" * 60)
-                                            
-                                        elif event_type == 'CALL_RINGING':
-                                            await logger.ainfo(f"🔔 CALL_RINGING - Phone is ringing (param: {param})")
-                                            
-                                        elif event_type == 'CALL_OUTGOING':
-                                            await logger.ainfo(f"📞 CALL_OUTGOING - Initiating call (param: {param})")
-                                            
-                                        else:
-                                            await logger.ainfo(f"📡 Baresip event: {event_type} (param: {param})")
-                                        
-                                        events.append(msg_json)
-                                        
-                                        # Вызываем callback если задан
-                                        if callback:
-                                            await callback(msg_json)
-                                        
-                                        # Продолжаем мониторинг после CALL_ESTABLISHED для отслеживания завершения
-                                        # Не прерываем цикл сразу
-                                        
-                                        # Если звонок завершён, прекращаем мониторинг
-                                        if event_type in ['CALL_CLOSED', 'CALL_FAILED']:
-                                            await logger.ainfo("=" * 60)
-                                            await logger.ainfo(f"📵 Call ended: {event_type}")
-                                            await logger.ainfo(f"   → Param: {param}")
-                                            if call_established:
-                                                await logger.ainfo("   → WebSocket should be disconnected")
-                                            await logger.ainfo("=" * 60)
-                                            return events
-                                
-                                if msg_end < len(remaining) and remaining[msg_end] == ',':
-                                    remaining = remaining[msg_end + 1:]
-                                else:
-                                    break
-                            except (ValueError, json.JSONDecodeError) as e:
-                                await logger.adebug(f"Failed to parse event: {e}")
-                                break
-                
-                except asyncio.TimeoutError:
-                    # Продолжаем ждать события
-                    continue
-                    
+                        # Одна структурированная запись на событие
+                        await logger.ainfo(
+                            _EVENT_LOG_MESSAGES.get(event_type, "📡 Baresip event"),
+                            type=event_type,
+                            param=param,
+                            established=call_established,
+                        )
+                        
+                        events.append(msg_json)
+
+                        # Вызываем callback если задан
+                        if callback:
+                            await callback(msg_json)
+
+                        # Продолжаем мониторинг после CALL_ESTABLISHED для отслеживания завершения
+                        # Не прерываем цикл сразу
+
+                        # Если звонок завершён, прекращаем мониторинг
+                        if event_type in _CALL_END_EVENTS:
+                            return events
+        
+        except asyncio.TimeoutError:
+            pass
         except Exception as e:
             await logger.aerror("Error monitoring call events", error=str(e))
         finally:
-            # Закрываем отдельное соединение для мониторинга
-            try:
-                monitor_writer.close()
-                await monitor_writer.wait_closed()
-                await logger.ainfo("✅ Closed monitoring connection")
-            except:
-                pass
+            self._event_subscribers.discard(queue)
         
         await logger.ainfo(f"⏱️ Event monitoring completed. Found {len(events)} events")
         if not call_established and len(events) > 0:
@@ -39,6 +39,9 @@ def main() -> None:
         host=settings.app_host,
         port=settings.app_port,
         reload=settings.debug,
+        loop="uvloop",
+        http="httptools",
+        access_log=False,
         log_level=settings.log_level.lower()
     )
 
@@ -6,6 +6,8 @@ from src.models.call import (
     CallResponse,
     CallStatus,
     CallUpdate,
+    LIVE_CALL_STATUSES,
+    TERMINAL_CALL_STATUSES,
 )
 
 __all__ = [
@@ -16,4 +18,6 @@ __all__ = [
     "CallResponse",
     "CallStatus",
     "CallUpdate",
+    "LIVE_CALL_STATUSES",
+    "TERMINAL_CALL_STATUSES",
 ]
\ No newline at end of file
@@ -18,6 +18,11 @@ class CallStatus(str, Enum):
     FAILED = "failed"
 
 
+# Звонок ещё идёт / уже завершён - проверки членства вместо цепочек сравнений
+LIVE_CALL_STATUSES = frozenset({CallStatus.DIALING, CallStatus.RINGING, CallStatus.CONNECTED})
+TERMINAL_CALL_STATUSES = frozenset({CallStatus.COMPLETED, CallStatus.FAILED})
+
+
 class CallDirection(str, Enum):
     INBOUND = "inbound"
     OUTBOUND = "outbound"
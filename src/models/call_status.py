@@ -1,3 +1,4 @@
+import re
 from enum import Enum
 from typing import Optional
 
@@ -14,6 +15,38 @@ class CallEndReason(str, Enum):
     UNKNOWN = "unknown"  # Неизвестная причина
 
 
+# SIP коды и типичные сообщения baresip. Каждая ветка - lookahead от начала строки,
+# поэтому срабатывает первая по порядку ветка, а не самое левое совпадение в тексте.
+# Коды ограничены \b, чтобы не ловить их внутри номера телефона или порта.
+_END_REASON_RE = re.compile(
+    r"""^(?:
+        (?=.*?(?:\b486\b|busy))(?P<busy>)
+      | (?=.*?(?:\b603\b|decline))(?P<declined>)
+      | (?=.*?(?:\b408\b|timeout|no\ answer))(?P<no_answer>)
+      | (?=.*?(?:\b404\b|not\ found))(?P<not_found>)
+      | (?=.*?(?:\b480\b|unavailable))(?P<unavailable>)
+      | (?=.*?(?:\b503\b|service\ unavailable))(?P<service_unavailable>)
+      | (?=.*?(?:connection\ reset|network))(?P<network>)
+      | (?=.*?user)(?=.*?hangup)(?P<user_hangup>)
+      | (?=.*?remote)(?P<remote_hangup>)
+    )""",
+    re.IGNORECASE | re.DOTALL | re.VERBOSE,
+)
+
+# Имя группы -> (причина, описание); None - отдаём исходное сообщение baresip
+_END_REASONS: dict[str, tuple[CallEndReason, Optional[str]]] = {
+    "busy": (CallEndReason.BUSY, "Line busy"),
+    "declined": (CallEndReason.DECLINED, "Call declined"),
+    "no_answer": (CallEndReason.NO_ANSWER, "No answer"),
+    "not_found": (CallEndReason.UNREACHABLE, "Number not found"),
+    "unavailable": (CallEndReason.UNREACHABLE, "Temporarily unavailable"),
+    "service_unavailable": (CallEndReason.UNREACHABLE, "Service unavailable"),
+    "network": (CallEndReason.NETWORK_ERROR, None),
+    "user_hangup": (CallEndReason.USER_HANGUP, "User ended call"),
+    "remote_hangup": (CallEndReason.REMOTE_HANGUP, "Remote party ended call"),
+}
+
+
 def parse_call_end_reason(baresip_reason: str) -> tuple[CallEndReason, Optional[str]]:
     """
     Парсит причину завершения звонка из сообщения baresip.
@@ -21,38 +54,12 @@ def parse_call_end_reason(baresip_reason: str) -> tuple[CallEndReason, Optional[
     Returns:
         Tuple of (reason enum, detailed message)
     """
-    reason_lower = baresip_reason.lower()
-    
-    # SIP response codes and common messages
-    if "486" in baresip_reason or "busy" in reason_lower:
-        return CallEndReason.BUSY, "Line busy"
-    
-    elif "603" in baresip_reason or "decline" in reason_lower:
-        return CallEndReason.DECLINED, "Call declined"
-    
-    elif "408" in baresip_reason or "timeout" in reason_lower or "no answer" in reason_lower:
-        return CallEndReason.NO_ANSWER, "No answer"
-    
-    elif "404" in baresip_reason or "not found" in reason_lower:
-        return CallEndReason.UNREACHABLE, "Number not found"
-    
-    elif "480" in baresip_reason or "unavailable" in reason_lower:
-        return CallEndReason.UNREACHABLE, "Temporarily unavailable"
-    
-    elif "503" in baresip_reason or "service unavailable" in reason_lower:
-        return CallEndReason.UNREACHABLE, "Service unavailable"
-    
-    elif "connection reset" in reason_lower or "network" in reason_lower:
-        return CallEndReason.NETWORK_ERROR, baresip_reason
-    
-    elif "user" in reason_lower and "hangup" in reason_lower:
-        return CallEndReason.USER_HANGUP, "User ended call"
-    
-    elif "remote" in reason_lower:
-        return CallEndReason.REMOTE_HANGUP, "Remote party ended call"
-    
-    else:
+    match = _END_REASON_RE.match(baresip_reason)
+    if match is None:
         return CallEndReason.UNKNOWN, baresip_reason
+    
+    reason, detail = _END_REASONS[match.lastgroup]
+    return reason, detail if detail is not None else baresip_reason
 
 
 class CallState(str, Enum):
@@ -1,15 +1,40 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
 from typing import Optional
 from uuid import UUID
 
-from src.models.call import Call, CallUpdate
+from src.models.call import Call, CallStatus, CallUpdate
+
+# Строка статуса -> член enum без перебора в Enum.__call__
+_STATUS_BY_VALUE: dict[str, CallStatus] = {status.value: status for status in CallStatus}
+
+
+def _epoch(moment: Optional[datetime]) -> float:
+    """Секунды epoch для индекса; naive datetime в проекте - UTC (datetime.utcnow())"""
+    if moment is None:
+        return float("-inf")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
 
 
 class CallRepository:
     def __init__(self) -> None:
         self._calls: dict[UUID, Call] = {}
+        # (started_at в секундах epoch, id) по возрастанию - list() режет страницу без сортировки всех звонков
+        self._by_start: list[tuple[float, UUID]] = []
+        self._index_keys: dict[UUID, tuple[float, UUID]] = {}
     
     async def save(self, call: Call) -> Call:
         self._calls[call.id] = call
+        
+        key = (_epoch(call.started_at), call.id)
+        old_key = self._index_keys.get(call.id)
+        if old_key != key:
+            if old_key is not None:
+                self._remove_from_index(old_key)
+            insort(self._by_start, key)
+            self._index_keys[call.id] = key
         return call
     
     async def get(self, call_id: UUID) -> Optional[Call]:
@@ -20,8 +45,12 @@ class CallRepository:
         if not call:
             return None
         
-        update_data = update.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
+        # Только явно переданные поля, без промежуточного dict от model_dump
+        for field in update.model_fields_set:
+            value = getattr(update, field)
+            if field == "status" and type(value) is str:
+                # CallUpdate.model_construct не валидирует - приводим строку к CallStatus сами
+                value = _STATUS_BY_VALUE[value]
             setattr(call, field, value)
         
         if call.connected_at and call.ended_at:
@@ -34,19 +63,23 @@ class CallRepository:
     async def delete(self, call_id: UUID) -> bool:
         if call_id in self._calls:
             del self._calls[call_id]
+            self._remove_from_index(self._index_keys.pop(call_id))
             return True
         return False
     
+    def _remove_from_index(self, key: tuple[float, UUID]) -> None:
+        del self._by_start[bisect_left(self._by_start, key)]
+    
     async def list(
         self, 
         limit: int = 100, 
         offset: int = 0
     ) -> list[Call]:
-        calls = list(self._calls.values())
-        
-        calls.sort(key=lambda c: c.started_at or c.id, reverse=True)
+        # Новые звонки первыми: берём срез с конца индекса и разворачиваем только его
+        end = max(len(self._by_start) - offset, 0)
+        page = self._by_start[max(end - limit, 0):end]
         
-        return calls[offset:offset + limit]
+        return [self._calls[call_id] for _, call_id in reversed(page)]
     
     async def count(self) -> int:
         return len(self._calls)
\ No newline at end of file
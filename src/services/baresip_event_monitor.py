@@ -3,11 +3,13 @@
 """
 
 import asyncio
-import json
+import orjson
 import httpx
 import structlog
 from typing import Optional
 
+from src.infrastructure.telephony.baresip_controller import read_netstring
+
 logger = structlog.get_logger()
 
 
@@ -17,7 +19,12 @@ class BaresipEventMonitor:
     Обновляет статусы звонков при получении SIP событий.
     """
     
-    def __init__(self, host: str = "localhost", port: int = 4444, api_base_url: str = "http://localhost:8000"):
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 4444,
+        api_base_url: str = "http://localhost:8000",
+    ):
         self.host = host
         self.port = port
         self.api_base_url = api_base_url
@@ -25,6 +32,16 @@ class BaresipEventMonitor:
         self._monitor_task = None
         self.reader: Optional[asyncio.StreamReader] = None
         self.writer: Optional[asyncio.StreamWriter] = None
+        # Общий HTTP клиент на всё время работы - соединение с API переиспользуется
+        self._http: Optional[httpx.AsyncClient] = None
+        # Тип события звонка -> обработчик
+        self._dispatch = {
+            'CALL_ESTABLISHED': self._on_established,
+            'CALL_PROGRESS': self._on_progress,
+            'CALL_RINGING': self._on_ringing,
+            'CALL_CLOSED': self._on_closed,
+            'CALL_FAILED': self._on_failed,
+        }
         
     async def start(self):
         """Запуск мониторинга событий Baresip"""
@@ -32,6 +49,7 @@ class BaresipEventMonitor:
             return
             
         self._running = True
+        self._http = httpx.AsyncClient(base_url=self.api_base_url, timeout=5.0)
         self._monitor_task = asyncio.create_task(self._monitor_loop())
         await logger.ainfo("📡 Baresip Event Monitor started - listening for SIP events")
         
@@ -48,6 +66,10 @@ class BaresipEventMonitor:
         if self.writer:
             self.writer.close()
             await self.writer.wait_closed()
+        
+        if self._http:
+            await self._http.aclose()
+            self._http = None
             
         await logger.ainfo("Baresip Event Monitor stopped")
         
@@ -65,6 +87,9 @@ class BaresipEventMonitor:
             
     async def _monitor_loop(self):
         """Основной цикл мониторинга событий"""
+        # Обработчик связываем один раз; reader меняется при переподключении и берётся заново
+        process = self._process_message
+        reader = self.reader
         while self._running:
             try:
                 # Подключаемся если не подключены
@@ -72,125 +97,107 @@ class BaresipEventMonitor:
                     if not await self._connect():
                         await asyncio.sleep(5)
                         continue
+                    reader = self.reader
                         
-                # Читаем события
+                # Читаем событие целиком по длине из заголовка netstring.
+                # Таймаут на чтение не нужен: stop() отменяет задачу сам
                 try:
-                    data = await asyncio.wait_for(
-                        self.reader.read(4096),
-                        timeout=5.0
-                    )
-                    
-                    if data:
-                        await logger.debug(f"Received data from Baresip: {data[:200]}")
-                        await self._process_data(data)
-                    else:
-                        # Соединение закрыто
-                        await logger.awarning("Baresip connection closed, reconnecting...")
-                        self.reader = None
-                        self.writer = None
-                        
-                except asyncio.TimeoutError:
-                    # Таймаут чтения - это нормально
+                    payload = await read_netstring(reader)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                    # Соединение закрыто или потеряна граница сообщения
+                    logger.warning("Baresip connection closed, reconnecting...")
+                    self.writer.close()
+                    self.reader = None
+                    self.writer = None
                     continue
+                
+                await process(payload)
                     
             except Exception as e:
                 await logger.aerror(f"Baresip monitor error: {e}")
                 await asyncio.sleep(1)
                 
-    async def _process_data(self, data: bytes):
-        """Обработка полученных данных"""
+    async def _process_message(self, payload: memoryview):
+        """Обработка одного netstring-сообщения"""
         try:
-            response = data.decode('utf-8', errors='ignore')
+            msg_json = orjson.loads(payload)
             
-            # Парсим netstring события
-            remaining = response
+            # Логируем все события
+            if msg_json.get('event'):
+                logger.debug("Parsed event", event=msg_json)
             
-            while remaining and ':' in remaining:
-                try:
-                    colon_idx = remaining.index(':')
-                    length_str = remaining[:colon_idx]
-                    msg_length = int(length_str)
-                    msg_start = colon_idx + 1
-                    msg_end = msg_start + msg_length
-                    
-                    if msg_end <= len(remaining):
-                        msg = remaining[msg_start:msg_end]
-                        msg_json = json.loads(msg)
-                        
-                        # Логируем все события
-                        if msg_json.get('event'):
-                            await logger.debug(f"Parsed event: {msg_json}")
-                        
-                        # Обрабатываем событие
-                        await self._handle_event(msg_json)
-                        
-                    if msg_end < len(remaining) and remaining[msg_end] == ',':
-                        remaining = remaining[msg_end + 1:]
-                    else:
-                        break
-                        
-                except (ValueError, json.JSONDecodeError) as e:
-                    # Не удалось распарсить - пропускаем
-                    break
-                    
+            # Обрабатываем событие
+            await self._handle_event(msg_json)
+            
+        except orjson.JSONDecodeError:
+            # Не удалось распарсить - пропускаем
+            pass
         except Exception as e:
-            await logger.aerror(f"Error processing Baresip data: {e}")
+            logger.error("Error processing Baresip data", error=str(e))
             
     async def _handle_event(self, event: dict):
         """Обработка события от Baresip"""
         if not event.get('event'):
             return
             
-        event_type = event.get('type')
-        event_class = event.get('class')
+        # События звонка - обработчику по типу
+        if event.get('class') == 'call':
+            handler = self._dispatch.get(event.get('type'))
+            if handler:
+                await handler(event)
+    
+    async def _on_established(self, event: dict):
+        # Это SIP 200 OK - звонок установлен!
+        logger.info("🎉 CALL_ESTABLISHED - SIP 200 OK received!")
+        logger.info("Event details", event=event)
         
-        # Логируем важные события
-        if event_class == 'call':
-            if event_type == 'CALL_ESTABLISHED':
-                # Это SIP 200 OK - звонок установлен!
-                await logger.ainfo("🎉 CALL_ESTABLISHED - SIP 200 OK received!")
-                await logger.ainfo(f"Event details: {event}")
-                
-                # Обновляем статус активного звонка на CONNECTED
-                await self._update_active_call_status("connected")
-                
-            elif event_type == 'CALL_PROGRESS':
-                # Это SIP 183 - ранний медиа поток (оператор)
-                await logger.ainfo("📢 CALL_PROGRESS - SIP 183 Session Progress (early media)")
-                
-            elif event_type == 'CALL_RINGING':
-                # Это SIP 180 - звонок идёт
-                await logger.ainfo("🔔 CALL_RINGING - SIP 180 Ringing")
-                
-            elif event_type == 'CALL_CLOSED':
-                await logger.ainfo(f"📵 Call closed: {event.get('param')}")
-                
-            elif event_type == 'CALL_FAILED':
-                await logger.ainfo(f"❌ Call failed: {event.get('param')}")
+        # Обновляем статус активного звонка на CONNECTED
+        await self._update_active_call_status("connected")
+    
+    async def _on_progress(self, event: dict):
+        # Это SIP 183 - ранний медиа поток (оператор)
+        logger.info("📢 CALL_PROGRESS - SIP 183 Session Progress (early media)")
+    
+    async def _on_ringing(self, event: dict):
+        # Это SIP 180 - звонок идёт
+        logger.info("🔔 CALL_RINGING - SIP 180 Ringing")
+    
+    async def _on_closed(self, event: dict):
+        logger.info("📵 Call closed", param=event.get("param"))
+    
+    async def _on_failed(self, event: dict):
+        logger.info("❌ Call failed", param=event.get("param"))
                 
     async def _update_active_call_status(self, new_status: str):
         """Обновление статуса активного звонка"""
+        if self._http is None:
+            # Монитор ещё не запущен - обходимся разовым клиентом
+            async with httpx.AsyncClient(base_url=self.api_base_url, timeout=5.0) as client:
+                await self._patch_active_call_status(client, new_status)
+        else:
+            await self._patch_active_call_status(self._http, new_status)
+    
+    async def _patch_active_call_status(self, client: httpx.AsyncClient, new_status: str):
         try:
-            async with httpx.AsyncClient() as client:
-                # Получаем активный звонок
-                response = await client.get(f"{self.api_base_url}/api/calls/active")
-                if response.status_code == 200:
-                    data = response.json()
-                    call = data.get("call")
-                    if call:
-                        call_id = call.get("id")
-                        await logger.ainfo(f"Updating call {call_id} status to {new_status}")
-                        
-                        # Обновляем статус
-                        response = await client.patch(
-                            f"{self.api_base_url}/api/calls/{call_id}/status",
-                            params={"new_status": new_status}
-                        )
+            # Получаем активный звонок
+            response = await client.get("/api/calls/active")
+            if response.status_code == 200:
+                data = response.json()
+                call = data.get("call")
+                if call:
+                    call_id = call.get("id")
+                    await logger.ainfo(f"Updating call {call_id} status to {new_status}")
+                    
+                    # Обновляем статус
+                    response = await client.patch(
+                        f"/api/calls/{call_id}/status",
+                        params={"new_status": new_status}
+                    )
+                    
+                    if response.status_code == 200:
+                        await logger.ainfo(f"✅ Call {call_id} status updated to {new_status}")
+                    else:
+                        await logger.aerror(f"Failed to update call status: {response.status_code}")
                         
-                        if response.status_code == 200:
-                            await logger.ainfo(f"✅ Call {call_id} status updated to {new_status}")
-                        else:
-                            await logger.aerror(f"Failed to update call status: {response.status_code}")
-                            
         except Exception as e:
-            await logger.aerror(f"Error updating call status: {e}")
\ No newline at end of file
+            await logger.aerror(f"Error updating call status: {e}")
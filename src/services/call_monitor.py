@@ -4,13 +4,14 @@
 
 import asyncio
 import re
-from typing import Optional, Set
+from collections import OrderedDict
+from typing import Optional
 from datetime import datetime, timedelta
 import structlog
 
 from src.infrastructure.telephony.baresip_controller import BaresipController
 from src.services.call_service import CallService
-from src.models.call import CallStatus
+from src.models.call import CallStatus, TERMINAL_CALL_STATUSES
 
 logger = structlog.get_logger()
 
@@ -30,6 +31,12 @@ class CallMonitor:
         r"number.*does.*not.*exist",
     ]
     
+    # Все паттерны одним регулярным выражением - один проход по тексту вместо цикла
+    _UNAVAILABLE_RE = re.compile(
+        "|".join(f"(?:{pattern})" for pattern in UNAVAILABLE_PATTERNS),
+        re.IGNORECASE,
+    )
+    
     # Максимальное время ожидания ответа (секунды)
     MAX_RING_TIME = 30
     
@@ -39,6 +46,12 @@ class CallMonitor:
     # Максимальная длительность звонка (ElevenLabs лимит)
     MAX_CALL_DURATION = 300  # 5 минут
     
+    # События, после которых звонок завершаем
+    CALL_END_EVENTS = frozenset({"CALL_CLOSED", "CALL_FAILED"})
+    
+    # Сколько последних звонков помним; звонки, завершённые мимо _hangup_call, вытесняются
+    MONITORED_CALLS_LIMIT = 1024
+    
     def __init__(
         self,
         baresip: BaresipController,
@@ -48,7 +61,15 @@ class CallMonitor:
         self.call_service = call_service
         self._monitoring_task: Optional[asyncio.Task] = None
         self._running = False
-        self._monitored_calls: Set[str] = set()
+        # id звонка -> когда начали мониторинг, в порядке добавления
+        self._monitored_calls: OrderedDict[str, datetime] = OrderedDict()
+        # Подписка на события звонка из CallService (включая CALL_STARTED - с него взводится
+        # лимит дозвона); (None, None) - пробуждение по таймеру дозвона/длительности
+        self._events: Optional[asyncio.Queue] = None
+        self._wakeup_timer: Optional[asyncio.TimerHandle] = None
+        # Отложенная проверка автоответчика после SIP 183; задача создаётся, только когда она нужна
+        self._operator_check_timer: Optional[asyncio.TimerHandle] = None
+        self._operator_check_task: Optional[asyncio.Task] = None
         
     async def start(self):
         """Запуск мониторинга"""
@@ -56,6 +77,7 @@ class CallMonitor:
             return
             
         self._running = True
+        self._events = self.call_service.subscribe()
         self._monitoring_task = asyncio.create_task(self._monitor_loop())
         await logger.ainfo("Call monitor started")
         
@@ -70,46 +92,91 @@ class CallMonitor:
             except asyncio.CancelledError:
                 pass
             self._monitoring_task = None
+        
+        if self._events:
+            self.call_service.unsubscribe(self._events)
+            self._events = None
+        
+        if self._wakeup_timer:
+            self._wakeup_timer.cancel()
+            self._wakeup_timer = None
+        
+        if self._operator_check_timer:
+            self._operator_check_timer.cancel()
+            self._operator_check_timer = None
+        
+        if self._operator_check_task:
+            self._operator_check_task.cancel()
+            try:
+                await self._operator_check_task
+            except asyncio.CancelledError:
+                pass
+            self._operator_check_task = None
             
         await logger.ainfo("Call monitor stopped")
-        
+    
     async def _monitor_loop(self):
-        """Основной цикл мониторинга"""
+        """Основной цикл мониторинга: проверяем звонок только по событию или таймеру лимита"""
+        # Методы, вызываемые на каждой итерации, связываем один раз
+        get_event = self._events.get
+        check = self._check_active_calls
         while self._running:
             try:
-                await self._check_active_calls()
-                await asyncio.sleep(1)  # Проверка каждую секунду
+                _call_id, event = await get_event()
+                await check(event)
             except Exception as e:
                 await logger.aerror(f"Error in monitor loop: {e}")
                 await asyncio.sleep(5)
+    
+    def _schedule_wakeup(self, delay: float) -> None:
+        """Будит цикл, когда истечёт ближайший лимит звонка"""
+        if self._wakeup_timer:
+            self._wakeup_timer.cancel()
+        self._wakeup_timer = asyncio.get_running_loop().call_later(
+            max(delay, 1.0), self._events.put_nowait, (None, None)  # не чаще раза в секунду, если hangup не удался
+        )
                 
-    async def _check_active_calls(self):
-        """Проверка активных звонков"""
+    async def _check_active_calls(self, event: Optional[dict] = None):
+        """Проверка активного звонка и обработка пришедшего события Baresip"""
         # Получаем активный звонок
         active_call = await self.call_service.get_active_call()
-        if not active_call:
+        if not active_call or active_call.status in TERMINAL_CALL_STATUSES:
             return
             
         call_id = str(active_call.id)
         
+        # Время берём один раз на весь проход
+        now = datetime.utcnow()
+        
         # Проверяем новые звонки
         if call_id not in self._monitored_calls:
-            self._monitored_calls.add(call_id)
+            self._monitored_calls[call_id] = now
+            if len(self._monitored_calls) > self.MONITORED_CALLS_LIMIT:
+                self._monitored_calls.popitem(last=False)
             await logger.ainfo(f"Started monitoring call {call_id}")
-            
+        
         # Проверяем различные условия для завершения звонка
-        await self._check_call_timeout(active_call)
-        await self._check_call_duration(active_call)
-        await self._check_call_status(active_call)
+        await self._check_call_timeout(active_call, now)
+        await self._check_call_duration(active_call, now)
+        if event:
+            await self._handle_call_event(active_call, event)
+        
+        # Следующая проверка - не позже момента, когда истечёт лимит дозвона или разговора
+        if active_call.status == CallStatus.DIALING and active_call.started_at:
+            elapsed = (now - active_call.started_at).total_seconds()
+            self._schedule_wakeup(self.MAX_RING_TIME - elapsed)
+        elif active_call.status == CallStatus.CONNECTED and active_call.connected_at:
+            elapsed = (now - active_call.connected_at).total_seconds()
+            self._schedule_wakeup(self.MAX_CALL_DURATION - elapsed)
         
-    async def _check_call_timeout(self, call):
+    async def _check_call_timeout(self, call, now: datetime):
         """Проверка таймаута звонка"""
         if call.status != CallStatus.DIALING:
             return
             
         # Проверяем, не слишком ли долго идёт дозвон
         if call.started_at:
-            ring_time = (datetime.utcnow() - call.started_at).total_seconds()
+            ring_time = (now - call.started_at).total_seconds()
             
             if ring_time > self.MAX_RING_TIME:
                 await logger.awarning(
@@ -117,14 +184,14 @@ class CallMonitor:
                 )
                 await self._hangup_call(call, "No answer - timeout")
     
-    async def _check_call_duration(self, call):
+    async def _check_call_duration(self, call, now: datetime):
         """Проверка максимальной длительности звонка"""
         if call.status != CallStatus.CONNECTED:
             return
             
         # Проверяем длительность активного звонка
         if call.connected_at:
-            call_duration = (datetime.utcnow() - call.connected_at).total_seconds()
+            call_duration = (now - call.connected_at).total_seconds()
             
             if call_duration > self.MAX_CALL_DURATION:
                 await logger.awarning(
@@ -132,121 +199,63 @@ class CallMonitor:
                 )
                 await self._hangup_call(call, "Max call duration exceeded")
                 
-    async def _check_call_status(self, call):
-        """Проверка статуса звонка через Baresip"""
-        try:
-            # Получаем информацию о звонке из Baresip
-            response = await self.baresip.send_command("l")  # list calls
-            
-            if response and response.data:
-                # Анализируем вывод для определения состояния
-                call_info = response.data.lower()
+    async def _handle_call_event(self, call, event: dict):
+        """Реакция на событие Baresip вместо опроса listcalls"""
+        event_type = event.get("type")
+        
+        # SIP 200 OK обрабатывает сам CallService (статус CONNECTED и сигнал аудио мосту);
+        # здесь после него только взводится лимит длительности в _check_active_calls
+        
+        # SIP 183 Session Progress - это НЕ ответ, это автоответчик оператора
+        if event_type == "CALL_PROGRESS":
+            if call.status == CallStatus.DIALING:
+                await logger.ainfo(f"Call {call.id} got SIP 183 (Progress) - likely operator message")
+                # Ждём немного и проверяем, не перешёл ли в 200
+                await self._schedule_operator_check(call)
                 
-                # Проверяем на SIP коды ошибок
-                if self._check_sip_errors(call_info):
-                    await self._hangup_call(call, "SIP error detected")
-                    return
-                    
-                # SIP 200 OK - абонент действительно ответил
-                if "200" in call_info or "established" in call_info:
-                    if call.status == CallStatus.DIALING:
-                        await logger.ainfo(f"Call {call.id} answered (SIP 200 OK)")
-                        await self._on_call_answered(call)
-                        
-                # SIP 183 Session Progress - это НЕ ответ, это автоответчик оператора
-                elif "183" in call_info:
-                    if call.status == CallStatus.DIALING:
-                        await logger.ainfo(f"Call {call.id} got SIP 183 (Progress) - likely operator message")
-                        # Ждём немного и проверяем, не перешёл ли в 200
-                        await self._schedule_operator_check(call)
-                        
-        except Exception as e:
-            await logger.aerror(f"Error checking call status: {e}")
-            
-    def _check_sip_errors(self, call_info: str) -> bool:
-        """Проверка на SIP ошибки"""
-        error_codes = [
-            "404",  # Not Found
-            "480",  # Temporarily Unavailable
-            "486",  # Busy Here
-            "603",  # Decline
-            "503",  # Service Unavailable
-        ]
-        
-        for code in error_codes:
-            if code in call_info:
-                return True
-        return False
-        
-    async def _on_call_answered(self, call):
-        """Обработка ответа абонента (SIP 200 OK)"""
-        # Обновляем статус на CONNECTED
-        await self.call_service.update_call_status(call.id, CallStatus.CONNECTED)
-        
-        # Теперь можно подключать WebSocket к ElevenLabs
-        await logger.ainfo(f"Call {call.id} connected, initiating ElevenLabs WebSocket")
-        
-        # Подключаем ElevenLabs
-        success = await self.call_service.connect_elevenlabs(call.id)
-        if not success:
-            await logger.aerror(f"Failed to connect ElevenLabs for call {call.id}, hanging up")
-            await self._hangup_call(call, "Failed to connect ElevenLabs")
+        # Звонок завершён на стороне SIP (в т.ч. 404/480/486/503/603)
+        elif event_type in self.CALL_END_EVENTS:
+            await self._hangup_call(call, f"{event_type}: {event.get('param', '')}")
         
     async def _schedule_operator_check(self, call):
         """Планирование проверки на автоответчик оператора при SIP 183"""
         # НЕ обновляем статус на CONNECTED, оставляем DIALING
-        # Запускаем таймер для проверки - если через 5 секунд всё ещё 183, то это автоответчик
-        asyncio.create_task(self._check_operator_message(call))
+        # Запускаем таймер для проверки - если через 5 секунд всё ещё 183, то это автоответчик.
+        # Повторный 183 переносит единственный таймер, а не плодит спящие задачи
+        if self._operator_check_timer:
+            self._operator_check_timer.cancel()
+        self._operator_check_timer = asyncio.get_running_loop().call_later(
+            self.OPERATOR_MESSAGE_DETECT_TIME, self._operator_check_cb, call
+        )
+        
+    def _operator_check_cb(self, call) -> None:
+        """Срабатывание таймера проверки автоответчика"""
+        self._operator_check_timer = None
+        # Ответил ли абонент после 183, проверяет сама задача по свежему статусу звонка
+        self._operator_check_task = asyncio.create_task(self._check_operator_message(call))
         
     async def _check_operator_message(self, call):
         """Проверка на сообщение оператора о недоступности при SIP 183"""
-        await asyncio.sleep(self.OPERATOR_MESSAGE_DETECT_TIME)
-        
-        # Проверяем текущий статус звонка
-        response = await self.baresip.send_command("l")
-        if response and response.data:
-            call_info = response.data.lower()
-            
-            # Если всё ещё SIP 183 после 5 секунд - это точно автоответчик
-            if "183" in call_info:
-                await logger.awarning(
-                    f"Call {call.id} still in SIP 183 after {self.OPERATOR_MESSAGE_DETECT_TIME}s - operator message detected"
-                )
-                await self._hangup_call(call, "Operator message detected (SIP 183)")
-                return
-                
-            # Если перешёл в 200 OK - абонент ответил
-            if "200" in call_info or "established" in call_info:
-                active_call = await self.call_service.get_call(call.id)
-                if active_call and active_call.status == CallStatus.DIALING:
-                    await logger.ainfo(f"Call {call.id} transitioned from 183 to 200 - real answer")
-                    await self._on_call_answered(active_call)
+        active_call = await self.call_service.get_call(call.id)
+        if active_call and active_call.status == CallStatus.DIALING:
+            await logger.awarning(
+                f"Call {call.id} still in SIP 183 after {self.OPERATOR_MESSAGE_DETECT_TIME}s - operator message detected"
+            )
+            await self._hangup_call(call, "Operator message detected (SIP 183)")
                 
     async def _hangup_call(self, call, reason: str):
         """Завершение звонка с указанием причины"""
+        # Убираем из мониторинга сразу - даже если завершение ниже упадёт
+        self._monitored_calls.pop(str(call.id), None)
         try:
             await logger.ainfo(f"Hanging up call {call.id}: {reason}")
             
             # Завершаем через сервис
             await self.call_service.end_call(call.id)
             
-            # Убираем из мониторинга
-            call_id = str(call.id)
-            if call_id in self._monitored_calls:
-                self._monitored_calls.remove(call_id)
-                
         except Exception as e:
             await logger.aerror(f"Error hanging up call {call.id}: {e}")
             
     def check_text_for_unavailability(self, text: str) -> bool:
         """Проверка текста на паттерны недоступности"""
-        if not text:
-            return False
-            
-        text_lower = text.lower()
-        
-        for pattern in self.UNAVAILABLE_PATTERNS:
-            if re.search(pattern, text_lower):
-                return True
-                
-        return False
\ No newline at end of file
+        return bool(text and self._UNAVAILABLE_RE.search(text))
@@ -10,18 +10,53 @@ from src.models.call import (
     CallCreate, 
     CallStatus, 
     CallDirection,
-    CallUpdate
+    CallUpdate,
+    LIVE_CALL_STATUSES,
+    TERMINAL_CALL_STATUSES,
 )
 from src.infrastructure.telephony.baresip_controller import BaresipController
 from src.infrastructure.audio.audio_bridge import AudioBridge, AudioFrame
+from src.infrastructure.audio.bridge_signals import (
+    CONNECT_SIGNAL_PIPE,
+    DISCONNECT_SIGNAL_PIPE,
+    send_bridge_signal,
+)
 from src.infrastructure.ai.elevenlabs_client import ElevenLabsClient
 from src.repositories.call_repository import CallRepository
 
 
 logger = structlog.get_logger()
 
+# Синтетическое событие для подписчиков: звонок начат, статус DIALING (от Baresip такого нет)
+CALL_STARTED_EVENT = "CALL_STARTED"
+
+
+def _apply_connected(call: Call, now: datetime) -> None:
+    if not call.connected_at:
+        call.connected_at = now
+
+
+def _apply_ended(call: Call, now: datetime) -> None:
+    if not call.ended_at:
+        call.ended_at = now
+        if call.connected_at:
+            call.duration_seconds = int((now - call.connected_at).total_seconds())
+
+
+# Статус -> изменение временных меток звонка при переходе в него
+_STATUS_APPLIERS = {
+    CallStatus.CONNECTED: _apply_connected,
+    **{status: _apply_ended for status in TERMINAL_CALL_STATUSES},
+}
+
 
 class CallService:
+    # Сколько ждём ответа абонента (SIP 200) после набора номера
+    ANSWER_TIMEOUT = 60.0
+    
+    # Не больше ~1.3 с аудио (20 мс фреймы) в очереди на запись; дальше выкидываем старые
+    OUT_FRAMES_MAX = 64
+    
     def __init__(
         self,
         baresip_controller: BaresipController,
@@ -36,13 +71,15 @@ class CallService:
         
         self._active_call: Optional[Call] = None
         self._audio_tasks: list[asyncio.Task] = []
+        # Мониторинг событий текущего звонка; отменяется при его завершении
+        self._monitor_task: Optional[asyncio.Task] = None
+        # Аудио от ElevenLabs пишется в мост одной задачей по порядку, а не задачей на фрейм
+        self._out_frames: asyncio.Queue[AudioFrame] = asyncio.Queue(maxsize=self.OUT_FRAMES_MAX)
+        # Подписчики на события звонка от Baresip: получают (call_id, event) без опроса API
+        self._event_subscribers: set[asyncio.Queue] = set()
         
     async def start_call(self, call_data: CallCreate) -> Call:
-        if self._active_call and self._active_call.status in [
-            CallStatus.DIALING, 
-            CallStatus.RINGING, 
-            CallStatus.CONNECTED
-        ]:
+        if self._active_call and self._active_call.status in LIVE_CALL_STATUSES:
             raise ValueError("Another call is already in progress")
         
         call = Call(
@@ -74,14 +111,13 @@ class CallService:
             await logger.ainfo("Audio transport ready, will connect WebSocket when call is answered")
             
             # Запускаем мониторинг событий звонка
-            asyncio.create_task(self._monitor_call_events(call.id))
+            self._monitor_task = asyncio.create_task(self._monitor_call_events(call.id))
             
-            # Оставляем статус DIALING пока не получим реальный ответ
-            call.status = CallStatus.DIALING
-            await self.repository.update(call.id, CallUpdate(
-                status=call.status,
-                connected_at=call.connected_at
-            ))
+            # CALL_OUTGOING съедает ответ на dial, поэтому о начале звонка сообщаем подписчикам сами -
+            # иначе звонок без дальнейших SIP событий так и остался бы без таймера дозвона
+            self._publish_event(call.id, {"class": "call", "type": CALL_STARTED_EVENT})
+            
+            # Статус остаётся DIALING (уже сохранён выше) пока не получим реальный ответ
             
             await logger.ainfo(
                 "Call started successfully",
@@ -93,7 +129,7 @@ class CallService:
             call.status = CallStatus.FAILED
             call.error = str(e)
             call.ended_at = datetime.utcnow()
-            await self.repository.update(call.id, CallUpdate(
+            await self.repository.update(call.id, CallUpdate.model_construct(
                 status=call.status,
                 error=call.error,
                 ended_at=call.ended_at
@@ -128,6 +164,7 @@ class CallService:
             
             # Настраиваем маршрутизацию аудио
             self._setup_audio_routing()
+            self._audio_tasks.append(asyncio.create_task(self._audio_output_loop()))
             
             await logger.ainfo(f"ElevenLabs connected successfully for call {call_id}")
             return True
@@ -145,20 +182,16 @@ class CallService:
         call.status = status
         
         # Обновляем временные метки в зависимости от статуса
-        if status == CallStatus.CONNECTED and not call.connected_at:
-            call.connected_at = datetime.utcnow()
-        elif status in [CallStatus.COMPLETED, CallStatus.FAILED] and not call.ended_at:
-            call.ended_at = datetime.utcnow()
-            if call.connected_at:
-                call.duration_seconds = int(
-                    (call.ended_at - call.connected_at).total_seconds()
-                )
+        applier = _STATUS_APPLIERS.get(status)
+        if applier:
+            applier(call, datetime.utcnow())
                 
-        await self.repository.update(call.id, CallUpdate(
+        # Поля уже провалидированы моделью Call - собираем патч без повторной валидации pydantic.
+        # duration_seconds репозиторий пересчитывает сам из connected_at/ended_at
+        await self.repository.update(call.id, CallUpdate.model_construct(
             status=status,
             connected_at=call.connected_at,
-            ended_at=call.ended_at,
-            duration_seconds=call.duration_seconds
+            ended_at=call.ended_at
         ))
         
         # Обновляем активный звонок, если это он
@@ -168,86 +201,51 @@ class CallService:
         return call
     
     async def end_call(self, call_id: Optional[UUID] = None) -> Optional[Call]:
-        import os
-        # Если указан конкретный call_id
-        if call_id:
-            # Проверяем, это активный звонок или нет
-            if self._active_call and self._active_call.id == call_id:
-                # Это активный звонок - завершаем через Baresip
-                call = self._active_call
-            else:
-                # Это другой звонок - просто обновляем в БД
-                call = await self.repository.get(call_id)
-                if not call:
-                    return None
-                    
-            # Завершаем звонок
-            if call == self._active_call:
-                await self.baresip.hangup()
-                
-                # Создаём файл-сигнал для отключения WebSocket
-                await logger.ainfo("📵 Creating WebSocket disconnect signal...")
-                with open("/tmp/disconnect_websocket", "w") as f:
-                    f.write(str(call_id))
-                await logger.ainfo("✅ Signal sent to disconnect WebSocket!")
-                
-                self._active_call = None
-                
-            call.status = CallStatus.COMPLETED
-            call.ended_at = datetime.utcnow()
-            if call.connected_at:
-                call.duration_seconds = int(
-                    (call.ended_at - call.connected_at).total_seconds()
-                )
-            else:
-                call.duration_seconds = 0
-                
-            await self.repository.update(call.id, CallUpdate(
-                status=call.status,
-                ended_at=call.ended_at,
-                duration_seconds=call.duration_seconds
-            ))
-            
-            await self._cleanup()
-            return call
-        
-        # Если call_id не указан - завершаем активный звонок
-        if not self._active_call:
+        # Без call_id или с id активного звонка - завершаем активный через Baresip,
+        # иначе это другой звонок - просто обновляем в БД
+        if call_id is None or (self._active_call and self._active_call.id == call_id):
+            call = self._active_call
+        else:
+            call = await self.repository.get(call_id)
+        if not call:
             return None
+            
+        is_active = call is self._active_call
+        if is_active:
+            await self.baresip.hangup()
+            
+            # Сигнал аудио мосту для отключения WebSocket
+            await self._signal_audio_bridge(DISCONNECT_SIGNAL_PIPE, call.id)
+            
+            self._active_call = None
+            
+        await self._complete_call(call)
         
-        call = self._active_call
-        
-        await self.baresip.hangup()
-        
-        # Создаём файл-сигнал для отключения WebSocket
-        await logger.ainfo("📵 Creating WebSocket disconnect signal...")
-        with open("/tmp/disconnect_websocket", "w") as f:
-            f.write(str(call.id))
-        await logger.ainfo("✅ Signal sent to disconnect WebSocket!")
-        
-        call.status = CallStatus.COMPLETED
-        call.ended_at = datetime.utcnow()
-        if call.connected_at:
-            call.duration_seconds = int(
-                (call.ended_at - call.connected_at).total_seconds()
-            )
-        
-        await self.repository.update(call.id, CallUpdate(
-            status=call.status,
-            ended_at=call.ended_at
-        ))
-        
-        await self._cleanup()
+        # Задачи и очередь аудио принадлежат активному звонку - завершение другого их не трогает
+        if is_active:
+            await self._cleanup()
         
         await logger.ainfo(
             "Call ended",
             call_id=str(call.id),
             duration=call.duration_seconds
         )
-        
-        self._active_call = None
         return call
     
+    async def _complete_call(self, call: Call) -> None:
+        """Переводит звонок в COMPLETED с моментом завершения сейчас и сохраняет одной записью"""
+        now = datetime.utcnow()
+        call.status = CallStatus.COMPLETED
+        call.ended_at = now
+        call.duration_seconds = (
+            int((now - call.connected_at).total_seconds()) if call.connected_at else 0
+        )
+        
+        await self.repository.update(call.id, CallUpdate.model_construct(
+            status=call.status,
+            ended_at=call.ended_at
+        ))
+    
     async def get_call(self, call_id: UUID) -> Optional[Call]:
         return await self.repository.get(call_id)
     
@@ -258,6 +256,22 @@ class CallService:
     ) -> list[Call]:
         return await self.repository.list(limit=limit, offset=offset)
     
+    async def count_calls(self) -> int:
+        return await self.repository.count()
+    
+    def subscribe(self) -> asyncio.Queue:
+        """Очередь, в которую попадает каждое событие звонка как (call_id, event)"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._event_subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._event_subscribers.discard(queue)
+    
+    def _publish_event(self, call_id: UUID, event: dict) -> None:
+        for queue in self._event_subscribers:
+            queue.put_nowait((call_id, event))
+    
     async def get_active_call(self) -> Optional[Call]:
         return self._active_call
     
@@ -267,116 +281,145 @@ class CallService:
         self.elevenlabs.set_transcript_callback(self._on_transcript)
     
     def _on_elevenlabs_audio(self, frame: AudioFrame) -> None:
-        asyncio.create_task(self.audio_bridge.write_frame(frame))
+        try:
+            self._out_frames.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Запись отстаёт - выкидываем самый старый фрейм, чтобы не копить задержку
+            self._out_frames.get_nowait()
+            self._out_frames.put_nowait(frame)
     
     def _on_transcript(self, text: str, is_user: bool) -> None:
         source = "User" if is_user else "Agent"
-        asyncio.create_task(logger.ainfo(
+        logger.info(
             f"{source} transcript",
             text=text,
             call_id=str(self._active_call.id) if self._active_call else None
-        ))
+        )
     
     async def _audio_input_loop(self) -> None:
-        while self._active_call and self._active_call.status == CallStatus.CONNECTED:
-            try:
-                frame = await self.audio_bridge.read_frame()
-                if frame:
-                    await self.elevenlabs.send_audio(frame)
-                else:
-                    await asyncio.sleep(0.01)
-            except Exception as e:
-                await logger.aerror("Error in audio input loop", error=str(e))
-                break
+        try:
+            # Итератор моста просыпается только на захваченное аудио - без опроса и sleep
+            async for frame in self.audio_bridge:
+                if not self._active_call or self._active_call.status != CallStatus.CONNECTED:
+                    break
+                await self.elevenlabs.send_audio(frame)
+        except Exception as e:
+            await logger.aerror("Error in audio input loop", error=str(e))
     
     async def _audio_output_loop(self) -> None:
-        while self._active_call and self._active_call.status == CallStatus.CONNECTED:
-            await asyncio.sleep(0.1)
+        """Пишет фреймы ElevenLabs в аудио мост в порядке получения"""
+        get_frame = self._out_frames.get
+        write_frame = self.audio_bridge.write_frame
+        while True:
+            try:
+                await write_frame(await get_frame())
+            except Exception as e:
+                await logger.aerror("Error in audio output loop", error=str(e))
     
     async def _monitor_call_events(self, call_id: UUID) -> None:
         """Мониторинг событий звонка для определения SIP статусов"""
-        import os
-        
         websocket_connected = False
+        # Дедлайн только на дозвон: после ответа снимается и ждём конца разговора без лимита
+        deadline = asyncio.timeout(self.ANSWER_TIMEOUT)
         
         async def handle_event(event: dict) -> None:
             """Callback для немедленной обработки событий"""
             nonlocal websocket_connected
             
             event_type = event.get('type')
-            await logger.ainfo(f"📨 Real-time event: {event_type}")
+            logger.debug("📨 Real-time event", type=event_type, call_id=str(call_id))
             
             if event_type == 'CALL_ESTABLISHED':
                 # SIP 200 OK - реальный ответ абонента!
-                await logger.ainfo("=" * 50)
-                await logger.ainfo(f"🎉 CALL_ESTABLISHED (SIP 200 OK) detected!")
-                await logger.ainfo(f"✅ Real person answered the call {call_id}")
-                await logger.ainfo("🔌 Connecting ElevenLabs WebSocket IMMEDIATELY...")
-                await logger.ainfo("=" * 50)
+                deadline.reschedule(None)
                 
-                # НЕМЕДЛЕННО обновляем статус звонка
-                await self.update_call_status(call_id, CallStatus.CONNECTED)
+                # НЕМЕДЛЕННО сигнализируем аудио мосту о подключении WebSocket - раньше любых логов
+                await self._signal_audio_bridge(CONNECT_SIGNAL_PIPE, call_id)
+                websocket_connected = True
                 
-                # НЕМЕДЛЕННО создаём файл-сигнал для подключения WebSocket
-                with open("/tmp/connect_websocket", "w") as f:
-                    f.write(str(call_id))
-                await logger.ainfo("✅ WebSocket connection signal sent INSTANTLY!")
+                # Обновляем статус звонка
+                await self.update_call_status(call_id, CallStatus.CONNECTED)
                 
-                websocket_connected = True
+                logger.info(
+                    "🎉 CALL_ESTABLISHED (SIP 200 OK) - real person answered, WebSocket signalled",
+                    call_id=str(call_id),
+                )
                 
             elif event_type == 'CALL_PROGRESS':
                 # SIP 183 - сообщение оператора
-                await logger.ainfo("=" * 50)
-                await logger.ainfo(f"📢 CALL_PROGRESS (SIP 183) detected")
-                await logger.ainfo("⚠️  This is an operator/voicemail message")
-                await logger.ainfo("❌ NOT connecting WebSocket (saving ElevenLabs credits)")
-                await logger.ainfo("=" * 50)
+                logger.info(
+                    "📢 CALL_PROGRESS (SIP 183) - operator/voicemail message, WebSocket not connected",
+                    call_id=str(call_id),
+                )
                 
             elif event_type in ['CALL_CLOSED', 'CALL_FAILED']:
                 # Звонок завершён
-                await logger.ainfo(f"📵 Call {call_id} ended: {event_type}")
+                logger.info("📵 Call ended", call_id=str(call_id), type=event_type)
                 
                 if websocket_connected:
                     # Если WebSocket был подключен - отключаем
-                    await logger.ainfo("🔌 Disconnecting WebSocket to save credits...")
-                    with open("/tmp/disconnect_websocket", "w") as f:
-                        f.write(str(call_id))
-                    await logger.ainfo("✅ WebSocket disconnect signal sent!")
+                    logger.info("🔌 Disconnecting WebSocket to save credits", call_id=str(call_id))
+                    await self._signal_audio_bridge(DISCONNECT_SIGNAL_PIPE, call_id)
                 
                 # НЕ вызываем end_call здесь, так как звонок уже завершён
+            
+            # Подписчикам - после своей обработки: статус звонка уже отражает событие
+            self._publish_event(call_id, event)
         
         try:
-            await logger.ainfo(f"📡 Starting REAL-TIME monitoring for call {call_id}")
-            await logger.ainfo("⏳ Events will be processed IMMEDIATELY as they arrive:")
-            await logger.ainfo("   - SIP 183 (CALL_PROGRESS) = operator message → NO WebSocket")
-            await logger.ainfo("   - SIP 200 (CALL_ESTABLISHED) = real answer → CONNECT WebSocket instantly")
-            
-            # Мониторим события с НЕМЕДЛЕННЫМ callback
-            events = await self.baresip.monitor_call_events(
-                timeout=60.0,
-                callback=handle_event  # Обрабатываем события СРАЗУ при получении!
+            logger.info(
+                "📡 Starting real-time call event monitoring "
+                "(SIP 183 - no WebSocket, SIP 200 - connect WebSocket)",
+                call_id=str(call_id),
             )
             
-            await logger.ainfo(f"Monitoring completed, processed {len(events)} events in real-time")
+            # Мониторим события с НЕМЕДЛЕННЫМ callback. Таймаут держим здесь: один
+            # дедлайн отменяет и чтение событий, и вложенные await обработчика
+            async with deadline:
+                events = await self.baresip.monitor_call_events(
+                    timeout=None,
+                    callback=handle_event  # Обрабатываем события СРАЗУ при получении!
+                )
+            
+            logger.info("Monitoring completed", call_id=str(call_id), events=len(events))
                     
-        except asyncio.TimeoutError:
-            await logger.aerror(f"⏰ Call monitoring timeout for {call_id} - no answer after 60 seconds")
+        except TimeoutError:
+            await logger.aerror(f"⏰ Call monitoring timeout for {call_id} - no answer after {self.ANSWER_TIMEOUT:.0f} seconds")
             if self._active_call and self._active_call.id == call_id:
                 await self.end_call(call_id)
         except Exception as e:
             await logger.aerror(f"Error monitoring call events: {e}")
     
+    async def _signal_audio_bridge(self, pipe_path: str, call_id: UUID) -> None:
+        """Отправка сигнала аудио мосту (run_audio_bridge.py) через FIFO"""
+        try:
+            if send_bridge_signal(pipe_path, str(call_id)):
+                logger.info("✅ Audio bridge signal sent", pipe=pipe_path, call_id=str(call_id))
+            else:
+                logger.warning("⚠️ Audio bridge is not listening, signal dropped", pipe=pipe_path)
+        except OSError as e:
+            logger.error("Failed to signal audio bridge", pipe=pipe_path, error=str(e))
+    
     async def _cleanup(self) -> None:
+        # Отменяем все задачи сразу и ждём их одним gather, а не по очереди
         for task in self._audio_tasks:
-            if not task.done():
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
+            task.cancel()
+        if self._audio_tasks:
+            await asyncio.gather(*self._audio_tasks, return_exceptions=True)
         
         self._audio_tasks.clear()
         
+        # Ожидать событий завершённого звонка до 60-секундного таймаута незачем.
+        # Сам себя мониторинг не отменяет - из него end_call вызывается по таймауту
+        monitor_task, self._monitor_task = self._monitor_task, None
+        if monitor_task and monitor_task is not asyncio.current_task():
+            monitor_task.cancel()
+            await asyncio.gather(monitor_task, return_exceptions=True)
+        
+        # Недописанное аудио завершённого звонка следующему не нужно
+        while not self._out_frames.empty():
+            self._out_frames.get_nowait()
+        
         # Временно отключаем очистку аудио компонентов
         # await self.audio_bridge.stop()
         # await self.elevenlabs.disconnect()
@@ -1,11 +1,13 @@
 """
 SIP Call Monitor - мониторинг SIP событий и управление WebSocket подключением.
 Подключает ElevenLabs WebSocket ТОЛЬКО при получении SIP 200 OK (реальный ответ).
+Заодно завершает звонки, зависшие в дозвоне (бывший SimpleCallMonitor) -
+один опрос /api/calls на оба обработчика.
 """
 
 import asyncio
 import httpx
-import json
+import orjson
 from typing import Optional
 from datetime import datetime
 import structlog
@@ -19,11 +21,26 @@ class SIPCallMonitor:
     Отслеживает SIP статусы и управляет подключением к ElevenLabs.
     """
     
-    def __init__(self, api_base_url: str = "http://localhost:8000"):
+    # Дозвон дольше этого (от started_at звонка) - вероятно автоответчик оператора
+    OPERATOR_MESSAGE_TIMEOUT = 10
+    
+    # Статусы из JSON API, после которых звонок перестаём отслеживать
+    _ENDED_STATUSES = frozenset({"completed", "failed"})
+    
+    def __init__(
+        self,
+        api_base_url: str = "http://localhost:8000",
+        client: Optional[httpx.AsyncClient] = None,
+    ):
         self.api_base_url = api_base_url
+        # Общий клиент (с base_url API) можно передать снаружи; иначе создаём свой в start()
+        self._client: Optional[httpx.AsyncClient] = client
+        self._owns_client = client is None
         self._running = False
         self._monitor_task = None
         self._active_calls = {}  # call_id -> call_info
+        # call_id -> момент started_at на монотонных часах цикла; started_at парсим один раз
+        self._dialing_started: dict[str, float] = {}
         
     async def start(self):
         """Запуск мониторинга"""
@@ -31,6 +48,14 @@ class SIPCallMonitor:
             return
             
         self._running = True
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_base_url,
+                limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=60),
+                timeout=httpx.Timeout(5.0, connect=1.0),
+                # Локальный API - сжатие ответа только тратит CPU на обеих сторонах
+                headers={"Accept-Encoding": "identity"},
+            )
         self._monitor_task = asyncio.create_task(self._monitor_loop())
         await logger.ainfo("🎯 SIP Call Monitor started - will connect WebSocket only on SIP 200 OK")
         
@@ -43,27 +68,61 @@ class SIPCallMonitor:
                 await self._monitor_task
             except asyncio.CancelledError:
                 pass
+        if self._owns_client and self._client:
+            await self._client.aclose()
+            self._client = None
         await logger.ainfo("SIP Call Monitor stopped")
         
     async def _monitor_loop(self):
         """Основной цикл мониторинга"""
-        async with httpx.AsyncClient() as client:
-            while self._running:
-                try:
-                    # Получаем активные звонки
-                    response = await client.get(f"{self.api_base_url}/api/calls")
-                    if response.status_code == 200:
-                        data = response.json()
-                        calls = data.get("calls", [])
-                        
-                        for call in calls:
-                            await self._check_call_status(client, call)
-                            
-                except Exception as e:
-                    await logger.aerror(f"SIP monitor error: {e}")
+        client = self._client
+        while self._running:
+            try:
+                # Получаем активные звонки
+                response = await client.get("/api/calls")
+                if response.status_code == 200:
+                    data = orjson.loads(response.content)
+                    calls = data.get("calls", [])
                     
-                await asyncio.sleep(2)  # Проверка каждые 2 секунды
+                    for call in calls:
+                        await self._check_dialing_timeout(client, call)
+                        await self._check_call_status(client, call)
+                        
+            except Exception as e:
+                await logger.aerror(f"SIP monitor error: {e}")
                 
+            await asyncio.sleep(2)  # Проверка каждые 2 секунды
+                
+    async def _check_dialing_timeout(self, client: httpx.AsyncClient, call: dict):
+        """Завершение звонка, который слишком долго в статусе dialing"""
+        call_id = call.get("id")
+        started_at = call.get("started_at")
+        
+        if not call_id:
+            return
+        if call.get("status") != "dialing" or not started_at:
+            self._dialing_started.pop(call_id, None)
+            return
+            
+        duration = self._dialing_elapsed(call_id, started_at)
+        
+        # Если звонит больше 10 секунд - вероятно автоответчик
+        if duration > self.OPERATOR_MESSAGE_TIMEOUT:
+            await logger.awarning(
+                f"Call {call_id} dialing for {duration:.0f}s - likely operator message, hanging up"
+            )
+            await self._hangup_call(client, call_id)
+            
+    def _dialing_elapsed(self, call_id: str, started_at: str) -> float:
+        """Секунды с начала дозвона; ISO время разбирается только при первой встрече звонка"""
+        now = asyncio.get_running_loop().time()
+        started = self._dialing_started.get(call_id)
+        if started is None:
+            start_time = datetime.fromisoformat(started_at.replace("Z", "+00:00"))
+            current_time = datetime.utcnow().replace(tzinfo=start_time.tzinfo)
+            started = self._dialing_started[call_id] = now - (current_time - start_time).total_seconds()
+        return now - started
+        
     async def _check_call_status(self, client: httpx.AsyncClient, call: dict):
         """Проверка статуса звонка и SIP событий"""
         call_id = call.get("id")
@@ -72,19 +131,22 @@ class SIPCallMonitor:
         if not call_id or not status:
             return
         
+        # Один поиск по id на проверку - дальше работаем с call_info
+        call_info = self._active_calls.get(call_id)
+        
         # Отслеживаем новые звонки в статусе dialing
         if status == "dialing":
-            if call_id not in self._active_calls:
-                self._active_calls[call_id] = {
-                    "started_at": datetime.utcnow(),
+            if call_info is None:
+                call_info = self._active_calls[call_id] = {
+                    "started_mono": asyncio.get_running_loop().time(),
                     "sip_status": None,
                     "websocket_connected": False
                 }
-                await logger.ainfo(f"📞 Tracking new call {call_id} - waiting for SIP response")
+                logger.info("📞 Tracking new call - waiting for SIP response", call_id=call_id)
             
             # Проверяем длительность звонка
-            call_info = self._active_calls[call_id]
-            duration = (datetime.utcnow() - call_info["started_at"]).total_seconds()
+            # Монотонные секунды цикла событий: вычитание float вместо datetime/timedelta
+            duration = asyncio.get_running_loop().time() - call_info["started_mono"]
             
             # Если звонит больше 10 секунд - просто логируем
             if duration > 10 and not call_info.get("websocket_connected"):
@@ -94,25 +156,16 @@ class SIPCallMonitor:
                 # После 30 секунд завершаем (увеличили с 15 до 30)
                 if duration > 30:
                     await logger.awarning(f"❌ Hanging up call {call_id} - timeout, no real answer")
-                    try:
-                        response = await client.post(
-                            f"{self.api_base_url}/api/calls/hangup",
-                            params={"call_id": call_id}
-                        )
-                        if response.status_code == 200:
-                            await logger.ainfo(f"✅ Successfully hung up call {call_id}")
-                            del self._active_calls[call_id]
-                    except Exception as e:
-                        await logger.aerror(f"Error hanging up call {call_id}: {e}")
+                    await self._hangup_call(client, call_id)
                         
         # Если статус изменился на connected - это SIP 200 OK!
         elif status == "connected":
-            if call_id in self._active_calls:
-                call_info = self._active_calls[call_id]
+            if call_info is not None:
                 if not call_info.get("websocket_connected"):
-                    await logger.ainfo(f"🎉 Call {call_id} CONNECTED - SIP 200 OK received!")
-                    await logger.ainfo(f"📞 Real person answered the call!")
-                    await logger.ainfo(f"🔌 NOW connecting ElevenLabs WebSocket for call {call_id}")
+                    logger.info(
+                        "🎉 Call CONNECTED (SIP 200 OK) - real person answered, connecting ElevenLabs WebSocket",
+                        call_id=call_id,
+                    )
                     
                     # Здесь должен вызываться connect_elevenlabs через CallService
                     # Но так как мы работаем через API, нужно отправить команду
@@ -122,17 +175,32 @@ class SIPCallMonitor:
                     call_info["sip_status"] = "200 OK"
                     
         # Удаляем завершённые звонки из отслеживания
-        elif status in ["completed", "failed"]:
-            if call_id in self._active_calls:
-                await logger.ainfo(f"Call {call_id} ended with status: {status}")
+        elif status in self._ENDED_STATUSES:
+            if call_info is not None:
+                logger.info("Call ended", call_id=call_id, status=status)
                 del self._active_calls[call_id]
                 
+    async def _hangup_call(self, client: httpx.AsyncClient, call_id: str):
+        """Завершение звонка через API"""
+        try:
+            response = await client.post(
+                "/api/calls/hangup",
+                params={"call_id": call_id}
+            )
+            if response.status_code == 200:
+                await logger.ainfo(f"✅ Successfully hung up call {call_id}")
+                self._active_calls.pop(call_id, None)
+            else:
+                await logger.aerror(f"Failed to hangup call {call_id}: {response.status_code}")
+        except Exception as e:
+            await logger.aerror(f"Error hanging up call {call_id}: {e}")
+            
     async def _connect_websocket_for_call(self, client: httpx.AsyncClient, call_id: str):
         """Подключение WebSocket для конкретного звонка"""
         try:
             # Вызываем эндпоинт для подключения WebSocket
             response = await client.post(
-                f"{self.api_base_url}/api/calls/{call_id}/connect_elevenlabs"
+                f"/api/calls/{call_id}/connect_elevenlabs"
             )
             
             if response.status_code == 200:
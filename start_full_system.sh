@@ -52,7 +52,10 @@ fi
 
 # 3. Очистка старых сигнальных файлов
 echo -e "\n${BLUE}3. Очистка старых сигналов${NC}"
-rm -f /tmp/connect_websocket /tmp/disconnect_websocket
+for sig in /tmp/connect_websocket /tmp/disconnect_websocket; do
+    # FIFO запущенного моста не трогаем - он держит их открытыми
+    [ -p "$sig" ] || rm -f "$sig"
+done
 echo -e "${GREEN}✅ Сигнальные файлы очищены${NC}"
 
 # 4. Запуск Baresip
@@ -0,0 +1,80 @@
+"""
+Ресэмплинг 8k <-> 16k чанками должен давать тот же непрерывный поток, что и за один вызов.
+"""
+
+import numpy as np
+import pytest
+
+from src.infrastructure.audio.audio_transport import AudioResampler
+
+AMPLITUDE = 10000
+TONE_HZ = 440
+# Задержка потокового фильтра: 20 сэмплов на 16kHz
+FILTER_DELAY_16K = 20
+
+
+def _sine(rate: int, samples: int, delay: int = 0) -> np.ndarray:
+    t = np.arange(samples) - delay
+    return AMPLITUDE * np.sin(2 * np.pi * TONE_HZ * t / rate)
+
+
+def _resample_chunked(signal: np.ndarray, chunk: int, from_rate: int, to_rate: int) -> np.ndarray:
+    resampler = AudioResampler()
+    return np.concatenate([
+        np.frombuffer(
+            resampler.resample_pcm(signal[i:i + chunk].tobytes(), from_rate, to_rate), dtype=np.int16
+        )
+        for i in range(0, len(signal), chunk)
+    ])
+
+
+@pytest.mark.parametrize(
+    ("from_rate", "to_rate", "chunk"),
+    [(8000, 16000, 160), (16000, 8000, 320)],
+)
+def test_chunks_match_single_pass(from_rate: int, to_rate: int, chunk: int) -> None:
+    """Граница чанка не видна: результат побитно равен ресэмплингу всего сигнала сразу"""
+    signal = _sine(from_rate, from_rate).astype(np.int16)
+    
+    chunked = _resample_chunked(signal, chunk, from_rate, to_rate)
+    single = np.frombuffer(AudioResampler().resample_pcm(signal.tobytes(), from_rate, to_rate), dtype=np.int16)
+    
+    assert len(chunked) == to_rate
+    np.testing.assert_array_equal(chunked, single)
+
+
+@pytest.mark.parametrize(
+    ("from_rate", "to_rate", "chunk"),
+    [(8000, 16000, 160), (16000, 8000, 320)],
+)
+def test_no_discontinuity_at_chunk_boundaries(from_rate: int, to_rate: int, chunk: int) -> None:
+    """Ошибка на стыках чанков не больше, чем в их середине"""
+    signal = _sine(from_rate, from_rate).astype(np.int16)
+    out_chunk = chunk * to_rate // from_rate
+    delay = FILTER_DELAY_16K * to_rate // 16000
+    
+    chunked = _resample_chunked(signal, chunk, from_rate, to_rate)
+    # Первый чанк пропускаем: фильтр ещё заполняется историей
+    error = np.abs(chunked - _sine(to_rate, len(chunked), delay))[out_chunk:].reshape(-1, out_chunk)
+    
+    edges = np.concatenate((error[:, :2], error[:, -2:]), axis=1)
+    assert edges.max() < 0.005 * AMPLITUDE
+    assert error.max() < 0.005 * AMPLITUDE
+
+
+def test_odd_length_downsampling_keeps_stream() -> None:
+    """Непарный сэмпл 16kHz переходит в следующий чанк, а не теряется"""
+    signal = _sine(16000, 16000).astype(np.int16)
+    single = np.frombuffer(AudioResampler().resample_pcm(signal.tobytes(), 16000, 8000), dtype=np.int16)
+    
+    resampler = AudioResampler()
+    parts = []
+    offset = 0
+    for size in [161, 159, 321, 1, 318] * 10:
+        parts.append(np.frombuffer(
+            resampler.resample_pcm(signal[offset:offset + size].tobytes(), 16000, 8000), dtype=np.int16
+        ))
+        offset += size
+    chunked = np.concatenate(parts)
+    
+    np.testing.assert_array_equal(chunked, single[:len(chunked)])
@@ -0,0 +1,152 @@
+"""
+CallMonitor подключён к приложению и работает от событий CallService.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+from src.api.app import create_app
+from src.core.di import create_container
+from src.models.call import CallCreate, CallStatus
+from src.repositories.call_repository import CallRepository
+from src.services import call_service as call_service_module
+from src.services.call_monitor import CallMonitor
+from src.services.call_service import CallService
+
+
+class FakeBaresip:
+    """Baresip без сокета: события звонка подаются тестом через events"""
+
+    def __init__(self) -> None:
+        self.events: asyncio.Queue[Optional[dict]] = asyncio.Queue()
+        self.hangups = 0
+
+    async def connect(self) -> None:
+        pass
+
+    async def disconnect(self) -> None:
+        pass
+
+    async def dial(self, number: str) -> SimpleNamespace:
+        return SimpleNamespace(success=True, error=None)
+
+    async def hangup(self) -> SimpleNamespace:
+        self.hangups += 1
+        await self.events.put(None)
+        return SimpleNamespace(success=True, error=None)
+
+    async def monitor_call_events(self, timeout: Optional[float] = None, callback=None) -> list[dict]:
+        events = []
+        while (event := await self.events.get()) is not None:
+            events.append(event)
+            await callback(event)
+        return events
+
+
+async def _wait_for(predicate: Callable[[], bool]) -> None:
+    async with asyncio.timeout(1):
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def baresip(monkeypatch: pytest.MonkeyPatch) -> FakeBaresip:
+    # Сигналы аудио мосту не уходят в настоящие FIFO
+    monkeypatch.setattr(call_service_module, "send_bridge_signal", lambda pipe, payload="": True)
+    return FakeBaresip()
+
+
+@pytest_asyncio.fixture
+async def monitor(baresip: FakeBaresip):
+    service = CallService(
+        baresip_controller=baresip,
+        audio_bridge=None,
+        elevenlabs_client=None,
+        call_repository=CallRepository(),
+    )
+    call_monitor = CallMonitor(baresip=baresip, call_service=service)
+    await call_monitor.start()
+    yield call_monitor
+    await call_monitor.stop()
+
+
+def _call_event(event_type: str) -> dict:
+    return {"event": True, "class": "call", "type": event_type, "param": ""}
+
+
+async def _start_call(monitor: CallMonitor):
+    return await monitor.call_service.start_call(CallCreate(phone_number="+79990000000"))
+
+
+def test_container_shares_call_service_with_monitor() -> None:
+    async def resolve():
+        container = create_container()
+        return await container.get(CallMonitor), await container.get(CallService)
+
+    call_monitor, service = asyncio.run(resolve())
+
+    assert call_monitor.call_service is service
+
+
+def test_app_lifespan_starts_and_stops_monitor() -> None:
+    app = create_app()
+    call_monitor = asyncio.run(app.state.dishka_container.get(CallMonitor))
+
+    with TestClient(app):
+        assert call_monitor._running
+
+    assert not call_monitor._running
+
+
+@pytest.mark.asyncio
+async def test_ring_limit_is_armed_when_call_starts(monitor: CallMonitor, baresip: FakeBaresip) -> None:
+    """Без единого события Baresip звонок всё равно завершается по лимиту дозвона"""
+    monitor.MAX_RING_TIME = 0
+
+    call = await _start_call(monitor)
+
+    await _wait_for(lambda: call.status == CallStatus.COMPLETED)
+    assert baresip.hangups == 1
+
+
+@pytest.mark.asyncio
+async def test_operator_message_survives_unrelated_events(monitor: CallMonitor, baresip: FakeBaresip) -> None:
+    """После SIP 183 другое событие не отменяет проверку автоответчика"""
+    monitor.OPERATOR_MESSAGE_DETECT_TIME = 0.05
+    call = await _start_call(monitor)
+
+    await baresip.events.put(_call_event("CALL_PROGRESS"))
+    await baresip.events.put(_call_event("CALL_RINGING"))
+
+    await _wait_for(lambda: call.status == CallStatus.COMPLETED)
+    assert baresip.hangups == 1
+
+
+@pytest.mark.asyncio
+async def test_answered_call_is_not_treated_as_operator_message(monitor: CallMonitor, baresip: FakeBaresip) -> None:
+    monitor.OPERATOR_MESSAGE_DETECT_TIME = 0.05
+    call = await _start_call(monitor)
+
+    await baresip.events.put(_call_event("CALL_PROGRESS"))
+    await baresip.events.put(_call_event("CALL_ESTABLISHED"))
+    await _wait_for(lambda: call.status == CallStatus.CONNECTED)
+    await asyncio.sleep(0.1)
+
+    assert call.status == CallStatus.CONNECTED
+    assert baresip.hangups == 0
+
+
+@pytest.mark.asyncio
+async def test_sip_close_ends_call(monitor: CallMonitor, baresip: FakeBaresip) -> None:
+    call = await _start_call(monitor)
+
+    await baresip.events.put(_call_event("CALL_ESTABLISHED"))
+    await baresip.events.put(_call_event("CALL_CLOSED"))
+
+    await _wait_for(lambda: call.status == CallStatus.COMPLETED)
+    assert call.ended_at is not None